@@ -1,5 +1,6 @@
 """FastAPI application serving the RAG Bible search interface."""
 
+import bisect
 import functools
 import logging
 import re
@@ -27,6 +28,7 @@ from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoin
 from starlette.responses import Response as StarletteResponse
 
 import config
+from rag.batching import MicroBatcher
 from rag.feedback import (
     flush_remaining,
     record_feedback,
@@ -34,16 +36,29 @@ from rag.feedback import (
     stop_flush_scheduler,
 )
 from rag.retrieve import load_pipeline as _load_pipeline
-from rag.retrieve import search as _search
+from rag.retrieve import search_batch as _search_batch
+from rag.semantic_cache import SemanticCache
 
 logger = logging.getLogger(__name__)
 
 # Module-level state set during lifespan
 pipeline: dict[str, Any] = {}
 pipeline_ready = threading.Event()
+PIPELINE_LOADER_THREAD = "pipeline-loader"
 
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 
+_TAG_RE = re.compile(r"<[^>]*>")
+_WS_RE = re.compile(r"\s+")
+# C0 control characters (except whitespace, collapsed by _WS_RE) and DEL are dropped;
+# \t-\r and the \x1c-\x1f separators match \s, so they still become spaces.
+# A regex, not str.translate, which takes a slow path on accented text.
+_CONTROL_RE = re.compile(r"[\x00-\x08\x0e-\x1b\x7f]")
+
+# Ascending thresholds and their labels, for bisect lookup in get_score_label
+_SCORE_THRESHOLDS: tuple[float, ...] = tuple(t for t, _ in sorted(config.SCORE_LABELS))
+_SCORE_LABEL_NAMES: tuple[str, ...] = tuple(label for _, label in sorted(config.SCORE_LABELS))
+
 
 def sanitize_query(raw: str) -> str:
     """Sanitize user query input.
@@ -58,10 +73,8 @@ def sanitize_query(raw: str) -> str:
     str
         Cleaned query string.
     """
-    text = raw.strip()
-    text = re.sub(r"<[^>]*>", "", text)
-    text = text.replace("\x00", "")
-    text = re.sub(r"\s+", " ", text).strip()
+    text = _TAG_RE.sub("", _CONTROL_RE.sub("", raw))
+    text = _WS_RE.sub(" ", text).strip()
     return text[: config.MAX_QUERY_LENGTH]
 
 
@@ -78,33 +91,97 @@ def get_score_label(score: float) -> str:
     str
         Human-readable relevance label.
     """
-    for threshold, label in config.SCORE_LABELS:
-        if score >= threshold:
-            return label
-    return config.SCORE_LABELS[-1][1]
+    pos = bisect.bisect_right(_SCORE_THRESHOLDS, score) - 1
+    return _SCORE_LABEL_NAMES[max(pos, 0)]
 
 
-@functools.lru_cache(maxsize=config.SEARCH_CACHE_SIZE)
-def _run_search_cached(query: str) -> list[dict[str, Any]]:
-    """Run the retrieval pipeline on a query (cached)."""
-    return _search(
-        query,
+def _run_search_batch(queries: list[str]) -> list[list[dict[str, Any]]]:
+    """Run the retrieval pipeline on a batch of queries."""
+    return _search_batch(
+        queries,
         pipeline["index"],
         pipeline["mapping"],
         pipeline["embed_model"],
         pipeline["cross_encoder"],
+        cache=pipeline["semantic_cache"],
     )
 
 
+# Concurrent /search requests share one embed + FAISS + rerank call
+_search_batcher: MicroBatcher[str, list[dict[str, Any]]] = MicroBatcher(
+    _run_search_batch,
+    window_s=config.SEARCH_BATCH_WINDOW_MS / 1000,
+    max_size=config.SEARCH_BATCH_MAX_SIZE,
+)
+
+
+@functools.lru_cache(maxsize=config.SEARCH_CACHE_SIZE)
+def _run_search_cached(query: str) -> list[dict[str, Any]]:
+    """Run the retrieval pipeline on a query (cached)."""
+    return _search_batcher.submit(query)
+
+
 def _run_search(query: str) -> list[dict[str, Any]]:
     """Return search results, copying dicts to avoid cache mutation."""
     return [dict(r) for r in _run_search_cached(query)]
 
 
+def build_verse_index(mapping: list[dict[str, Any]]) -> dict[tuple[str, str, str], int]:
+    """Build the reverse index from verse reference to mapping position.
+
+    Parameters
+    ----------
+    mapping : list[dict[str, Any]]
+        Full verse mapping list.
+
+    Returns
+    -------
+    dict[tuple[str, str, str], int]
+        ``(book_title, chapter, verse)`` to mapping index.
+    """
+    return {(e["book_title"], e["chapter"], e["verse"]): i for i, e in enumerate(mapping)}
+
+
+def build_book_ranges(mapping: list[dict[str, Any]]) -> dict[int, tuple[int, int]] | None:
+    """Compute the mapping index range covered by each book.
+
+    Parameters
+    ----------
+    mapping : list[dict[str, Any]]
+        Full verse mapping list, ordered so each book is contiguous.
+
+    Returns
+    -------
+    dict[int, tuple[int, int]] | None
+        ``book_id`` to ``(first, last)`` mapping indices (inclusive), or
+        ``None`` if a book reappears after another one. Ingestion rejects such
+        mappings, so this only happens with artifacts built elsewhere;
+        :func:`get_verse_context` then walks neighbours by ``book_id``.
+    """
+    ranges: dict[int, tuple[int, int]] = {}
+    for i, entry in enumerate(mapping):
+        book_id = entry["book_id"]
+        if book_id in ranges:
+            first, last = ranges[book_id]
+            if last != i - 1:
+                logger.warning(
+                    "Book %s is not contiguous in the mapping (reappears at index %d); "
+                    "verse context falls back to a per-verse book_id walk",
+                    book_id,
+                    i,
+                )
+                return None
+        else:
+            first = i
+        ranges[book_id] = (first, i)
+    return ranges
+
+
 def get_verse_context(
     result: dict[str, Any],
     mapping: list[dict[str, Any]],
     verse_index: dict[tuple[str, str, str], int],
+    book_ranges: dict[int, tuple[int, int]] | None,
     n: int = config.CONTEXT_VERSES,
 ) -> list[dict[str, Any]]:
     """Return surrounding verses for context display.
@@ -117,6 +194,9 @@ def get_verse_context(
         Full verse mapping list.
     verse_index : dict[tuple[str, str, str], int]
         Reverse index from (book_title, chapter, verse) to mapping index.
+    book_ranges : dict[int, tuple[int, int]] | None
+        Per-book index ranges from :func:`build_book_ranges`, or ``None`` to
+        bound the window by comparing neighbouring ``book_id`` values.
     n : int
         Number of context verses before and after.
 
@@ -138,29 +218,29 @@ def get_verse_context(
             }
         ]
 
-    matched_book_id = mapping[idx]["book_id"]
-    start = idx
-    while start > idx - n and start > 0 and mapping[start - 1]["book_id"] == matched_book_id:
-        start -= 1
-
-    end = idx
-    while (
-        end < idx + n and end < len(mapping) - 1 and mapping[end + 1]["book_id"] == matched_book_id
-    ):
-        end += 1
-
-    context = []
-    for i in range(start, end + 1):
-        entry = mapping[i]
-        context.append(
-            {
-                "chapter": entry["chapter"],
-                "verse": entry["verse"],
-                "text": entry["text"],
-                "is_match": i == idx,
-            }
-        )
-    return context
+    # Clamp the window to the matched verse's book so context never crosses books
+    book_id = mapping[idx]["book_id"]
+    if book_ranges is not None:
+        first, last = book_ranges[book_id]
+        start = max(idx - n, first)
+        end = min(idx + n, last)
+    else:
+        start = idx
+        while start > max(idx - n, 0) and mapping[start - 1]["book_id"] == book_id:
+            start -= 1
+        end = idx
+        while end < min(idx + n, len(mapping) - 1) and mapping[end + 1]["book_id"] == book_id:
+            end += 1
+
+    return [
+        {
+            "chapter": entry["chapter"],
+            "verse": entry["verse"],
+            "text": entry["text"],
+            "is_match": i == idx,
+        }
+        for i, entry in enumerate(mapping[start : end + 1], start)
+    ]
 
 
 def nl2br(value: str) -> Markup:
@@ -169,6 +249,27 @@ def nl2br(value: str) -> Markup:
     return Markup(escaped.replace("\n", "<br>"))
 
 
+def _warmup_pipeline() -> None:
+    """Run one uncached search to initialize ONNX sessions and fault in the index.
+
+    Reranking is forced so the cross-encoder session is warmed even when the
+    FAISS ranking of the warmup query would be decisive.
+
+    Failures are logged and ignored: real queries surface their own errors.
+    """
+    try:
+        _search_batch(
+            [config.WARMUP_QUERY],
+            pipeline["index"],
+            pipeline["mapping"],
+            pipeline["embed_model"],
+            pipeline["cross_encoder"],
+            rerank_skip_margin=None,
+        )
+    except Exception:
+        logger.warning("Pipeline warmup search failed", exc_info=True)
+
+
 def _load_pipeline_background() -> None:
     """Load the retrieval pipeline in a background thread."""
     try:
@@ -178,11 +279,14 @@ def _load_pipeline_background() -> None:
         pipeline["embed_model"] = embed_model
         pipeline["cross_encoder"] = cross_encoder
 
-        verse_idx: dict[tuple[str, str, str], int] = {}
-        for i, entry in enumerate(mapping):
-            key = (entry["book_title"], entry["chapter"], entry["verse"])
-            verse_idx[key] = i
-        pipeline["verse_index"] = verse_idx
+        pipeline["verse_index"] = build_verse_index(mapping)
+        pipeline["book_ranges"] = build_book_ranges(mapping)
+        pipeline["semantic_cache"] = (
+            SemanticCache(config.SEMANTIC_CACHE_SIZE, config.SEMANTIC_CACHE_THRESHOLD)
+            if config.SEMANTIC_CACHE_SIZE > 0
+            else None
+        )
+        _warmup_pipeline()
 
         pipeline["loaded"] = True
         pipeline_ready.set()
@@ -194,7 +298,9 @@ def _load_pipeline_background() -> None:
 @asynccontextmanager
 async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
     """Spawn background pipeline loading so HTTP is available immediately."""
-    thread = threading.Thread(target=_load_pipeline_background, daemon=True)
+    thread = threading.Thread(
+        target=_load_pipeline_background, name=PIPELINE_LOADER_THREAD, daemon=True
+    )
     thread.start()
     if config.FEEDBACK_ENV == "production":
         start_flush_scheduler(
@@ -206,6 +312,7 @@ async def lifespan(_app: FastAPI) -> AsyncGenerator[None, None]:
     if config.FEEDBACK_ENV == "production":
         stop_flush_scheduler()
         flush_remaining(config.FEEDBACK_BUFFER_PATH, config.FEEDBACK_HF_REPO)
+    _search_batcher.stop()
     _run_search_cached.cache_clear()
     pipeline.clear()
     pipeline_ready.clear()
@@ -343,7 +450,9 @@ def search_endpoint(request: Request, query: str = Form("")) -> HTMLResponse:
     for r in relevant:
         r["label"] = get_score_label(r["score"])
         r["pct"] = int(r["score"] * 100)
-        r["context_verses"] = get_verse_context(r, pipeline["mapping"], pipeline["verse_index"])
+        r["context_verses"] = get_verse_context(
+            r, pipeline["mapping"], pipeline["verse_index"], pipeline["book_ranges"]
+        )
 
     return templates.TemplateResponse(
         request=request,
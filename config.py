@@ -9,6 +9,7 @@ DATA_DIR: Path = Path(__file__).parent / "data"
 DB_PATH: Path = DATA_DIR / "bible.db"
 INDEX_PATH: Path = DATA_DIR / "index.faiss"
 MAPPING_PATH: Path = DATA_DIR / "mapping.json"
+EMBEDDINGS_CACHE_DIR: Path = DATA_DIR / "embeddings_cache"
 
 # Embedding model
 EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
@@ -26,10 +27,38 @@ _onnx_map: dict[str, str] = {
 }
 ONNX_FILE_NAME: str = _onnx_map.get(_machine, "onnx/model.onnx")
 
+# FAISS index ("flat" = exact IndexFlatIP, "hnsw" = IndexHNSWFlat graph search,
+# "sq8" = exhaustive (lossy) search over 8-bit scalar-quantized vectors, 4x smaller,
+# "sqfp16" = exhaustive (lossy) search over float16 vectors, 2x smaller than flat,
+# "ivfpq" = inverted lists over 32-byte PQ codes, ~48x smaller, approximate)
+FAISS_INDEX_TYPE: str = "hnsw"
+FAISS_HNSW_M: int = 32
+FAISS_HNSW_EF_CONSTRUCTION: int = 200
+FAISS_EF_SEARCH: int = 64
+FAISS_IVF_NLIST: int = 256
+FAISS_PQ_M: int = 32
+FAISS_NPROBE: int = 16
+# Copy flat indexes to GPU 0 at load when faiss reports a GPU (never with faiss-cpu)
+FAISS_USE_GPU: bool = True
+
 # Retrieval parameters
 FAISS_TOP_K: int = 20
 RERANK_TOP_K: int = 5
-SEARCH_CACHE_SIZE: int = 128
+RERANK_BATCH_SIZE: int = 32
+# Skip the cross-encoder when FAISS top-1 beats the RERANK_TOP_K-th by this margin.
+# Skipped queries are scored by clipped cosine, not the sigmoid scale SCORE_LABELS
+# and feedback assume, so this stays off (None) until evaluated on the corpus.
+RERANK_SKIP_MARGIN: float | None = None
+SEARCH_CACHE_SIZE: int = 1024
+# Paraphrased queries whose embedding has cosine >= threshold reuse cached results.
+# Off (0) until the threshold is evaluated on the corpus: a hit returns another
+# query's results, so a too-low threshold silently serves wrong verses.
+SEMANTIC_CACHE_SIZE: int = 0
+SEMANTIC_CACHE_THRESHOLD: float = 0.97
+SEARCH_BATCH_WINDOW_MS: float = 5.0
+SEARCH_BATCH_MAX_SIZE: int = 8
+# Run once at pipeline load so the first real query does not pay the cold start
+WARMUP_QUERY: str = "Au commencement Dieu créa le ciel et la terre"
 
 # Ingestion filters
 MIN_TEXT_LENGTH: int = 10
@@ -0,0 +1,123 @@
+"""Micro-batching of concurrent calls into a single batched call."""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher[T, R]:
+    """Coalesce concurrent submissions into batched calls on a worker thread.
+
+    The worker waits for a first item, then collects more for up to
+    ``window_s`` seconds (or until ``max_size`` items) and runs them through
+    ``fn`` in one call. Callers block in :meth:`submit` until their own
+    result is available.
+
+    Parameters
+    ----------
+    fn : Callable[[list[T]], list[R]]
+        Batched function returning one result per input, in input order.
+    window_s : float
+        Seconds to wait for more items once the first one has arrived.
+    max_size : int
+        Maximum number of items per batch.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[list[T]], list[R]],
+        window_s: float,
+        max_size: int,
+    ) -> None:
+        self._fn = fn
+        self._window_s = window_s
+        self._max_size = max_size
+        self._queue: queue.SimpleQueue[tuple[T, Future[R]] | None] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def submit(self, item: T) -> R:
+        """Run an item through the next batch and wait for its result.
+
+        Parameters
+        ----------
+        item : T
+            Input for the batched function.
+
+        Returns
+        -------
+        R
+            Result for ``item``. Exceptions raised by the batched function
+            are re-raised here.
+        """
+        self._ensure_started()
+        future: Future[R] = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def stop(self) -> None:
+        """Stop the worker thread after the batch in progress completes."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _ensure_started(self) -> None:
+        """Start the worker thread on first use."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Collect items into batches until a stop sentinel is received."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stopping = False
+            deadline = time.monotonic() + self._window_s
+            while len(batch) < self._max_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._process(batch)
+            if stopping:
+                return
+
+    def _process(self, batch: list[tuple[T, Future[R]]]) -> None:
+        """Run one batch and resolve its futures.
+
+        If a multi-item batch fails, items are retried one by one so a
+        single bad input does not fail the other callers.
+        """
+        try:
+            results = self._fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        except Exception as exc:
+            if len(batch) == 1:
+                batch[0][1].set_exception(exc)
+                return
+            logger.warning("Batch of %d failed, retrying items individually", len(batch))
+            for entry in batch:
+                self._process([entry])
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
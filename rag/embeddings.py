@@ -1,11 +1,14 @@
 """Model abstraction layer for embedding and cross-encoder models."""
 
+import functools
+
 import numpy as np
 from sentence_transformers import CrossEncoder, SentenceTransformer
 
 import config
 
 
+@functools.cache
 def load_embedding_model(model_name: str | None = None) -> SentenceTransformer:
     """Load a SentenceTransformer embedding model.
 
@@ -17,7 +20,8 @@ def load_embedding_model(model_name: str | None = None) -> SentenceTransformer:
     Returns
     -------
     SentenceTransformer
-        Loaded embedding model.
+        Loaded embedding model. Cached per ``model_name``, so repeated calls
+        share one instance.
     """
     name = model_name or config.EMBEDDING_MODEL
     return SentenceTransformer(
@@ -61,6 +65,7 @@ def encode_texts(
     return embeddings
 
 
+@functools.cache
 def load_cross_encoder(model_name: str | None = None) -> CrossEncoder:
     """Load a CrossEncoder reranking model.
 
@@ -72,7 +77,8 @@ def load_cross_encoder(model_name: str | None = None) -> CrossEncoder:
     Returns
     -------
     CrossEncoder
-        Loaded cross-encoder model.
+        Loaded cross-encoder model. Cached per ``model_name``, so repeated
+        calls share one instance.
     """
     name = model_name or config.CROSS_ENCODER_MODEL
     model: CrossEncoder = CrossEncoder(
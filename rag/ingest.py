@@ -1,12 +1,17 @@
 """Atomic ingestion script: filter, embed, and index Bible verses."""
 
+import hashlib
 import json
 import logging
+import os
 import sqlite3
+import tempfile
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
 import faiss
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 import config
@@ -14,6 +19,18 @@ from rag.embeddings import encode_texts, load_embedding_model
 
 logger = logging.getLogger(__name__)
 
+VERSE_COLUMNS: tuple[str, ...] = (
+    "rowid",
+    "book",
+    "book_id",
+    "book_title",
+    "chapter",
+    "chapter_id",
+    "chapter_title",
+    "verse",
+    "text",
+)
+
 
 def fetch_verses(db_path: Path) -> list[dict[str, Any]]:
     """Fetch all verses from the SQLite database.
@@ -29,12 +46,12 @@ def fetch_verses(db_path: Path) -> list[dict[str, Any]]:
         List of verse dicts with rowid and all column values.
     """
     with sqlite3.connect(db_path) as conn:
-        conn.row_factory = sqlite3.Row
-        cursor = conn.execute(
-            "SELECT rowid, book, book_id, book_title, chapter, chapter_id, "
-            "chapter_title, verse, text FROM verses"
-        )
-        return [dict(row) for row in cursor.fetchall()]
+        # Plain tuples zipped with the column names: no sqlite3.Row objects
+        # or intermediate fetchall() list before building the dicts. rowid
+        # order makes the mapping order deterministic; book contiguity is
+        # checked separately by check_books_contiguous.
+        cursor = conn.execute(f"SELECT {', '.join(VERSE_COLUMNS)} FROM verses ORDER BY rowid")
+        return [dict(zip(VERSE_COLUMNS, row, strict=True)) for row in cursor]
 
 
 def filter_verses(
@@ -58,15 +75,102 @@ def filter_verses(
     list[dict[str, Any]]
         Filtered verse dicts.
     """
+    # Splitting at most min_words - 1 times stops after the words needed for the
+    # check instead of building every word of the verse.
+    max_split = max(min_words - 1, 0)
     return [
-        v for v in verses if len(v["text"]) >= min_length and len(v["text"].split()) >= min_words
+        v
+        for v in verses
+        if len(text := v["text"]) >= min_length and len(text.split(None, max_split)) >= min_words
     ]
 
 
+def check_books_contiguous(mapping: list[dict[str, Any]]) -> None:
+    """Check that each book's verses form one contiguous run in the mapping.
+
+    The app clamps verse context to a single ``(first, last)`` index range per
+    book, which is only correct if no book reappears after another one.
+
+    Parameters
+    ----------
+    mapping : list[dict[str, Any]]
+        Verse mapping in index order.
+
+    Raises
+    ------
+    ValueError
+        If a ``book_id`` reappears after another book.
+    """
+    seen: set[int] = set()
+    previous = None
+    for i, entry in enumerate(mapping):
+        book_id = entry["book_id"]
+        if book_id != previous:
+            if book_id in seen:
+                raise ValueError(
+                    f"Book {book_id} is not contiguous in the mapping (reappears at index {i})"
+                )
+            seen.add(book_id)
+            previous = book_id
+
+
+_SCALAR_QUANTIZERS: dict[str, int] = {
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+    "sqfp16": faiss.ScalarQuantizer.QT_fp16,
+}
+
+
+def create_index(dimension: int, index_type: str = config.FAISS_INDEX_TYPE) -> faiss.Index:
+    """Create an empty FAISS inner-product index of the given type.
+
+    Parameters
+    ----------
+    dimension : int
+        Embedding dimension.
+    index_type : str
+        ``"flat"`` for exact search (IndexFlatIP), ``"hnsw"`` for
+        approximate graph search (IndexHNSWFlat), ``"sq8"`` for exhaustive
+        (lossy) search over 8-bit scalar-quantized vectors, ``"sqfp16"`` for
+        exhaustive (lossy) search over float16 vectors (both
+        IndexScalarQuantizer) or
+        ``"ivfpq"`` for approximate search over product-quantized codes in
+        ``FAISS_IVF_NLIST`` inverted lists (IndexIVFPQ).
+
+    Returns
+    -------
+    faiss.Index
+        Empty index using the inner-product metric. Quantized types must be
+        trained before vectors are added.
+
+    Raises
+    ------
+    ValueError
+        If ``index_type`` is not supported.
+    """
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dimension)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = config.FAISS_HNSW_EF_CONSTRUCTION
+        return index
+    if index_type in _SCALAR_QUANTIZERS:
+        return faiss.IndexScalarQuantizer(
+            dimension, _SCALAR_QUANTIZERS[index_type], faiss.METRIC_INNER_PRODUCT
+        )
+    if index_type == "ivfpq":
+        return faiss.index_factory(
+            dimension,
+            f"IVF{config.FAISS_IVF_NLIST},PQ{config.FAISS_PQ_M}",
+            faiss.METRIC_INNER_PRODUCT,
+        )
+    raise ValueError(f"Unsupported FAISS index type: {index_type!r}")
+
+
 def build_index(
     texts: list[str],
     model: SentenceTransformer,
     dimension: int = config.EMBEDDING_DIMENSION,
+    index_type: str = config.FAISS_INDEX_TYPE,
 ) -> faiss.Index:
     """Embed texts and build a FAISS inner-product index.
 
@@ -78,18 +182,176 @@ def build_index(
         Loaded embedding model.
     dimension : int
         Embedding dimension.
+    index_type : str
+        Index type passed to :func:`create_index`.
 
     Returns
     -------
     faiss.Index
-        FAISS IndexFlatIP with all embeddings added.
+        FAISS index with all embeddings added.
     """
     embeddings = encode_texts(model, texts)
-    index = faiss.IndexFlatIP(dimension)
+    return index_embeddings(embeddings, dimension, index_type)
+
+
+def index_embeddings(
+    embeddings: np.ndarray,
+    dimension: int = config.EMBEDDING_DIMENSION,
+    index_type: str = config.FAISS_INDEX_TYPE,
+) -> faiss.Index:
+    """Build a FAISS inner-product index from precomputed embeddings.
+
+    Parameters
+    ----------
+    embeddings : np.ndarray
+        L2-normalized embeddings of shape ``(n, dimension)``.
+    dimension : int
+        Embedding dimension.
+    index_type : str
+        Index type passed to :func:`create_index`.
+
+    Returns
+    -------
+    faiss.Index
+        FAISS index with all embeddings added.
+    """
+    index = create_index(dimension, index_type)
+    if not index.is_trained:
+        index.train(embeddings)
     index.add(embeddings)
     return index
 
 
+def _replace_file(path: Path, write: Callable[[Path], None]) -> None:
+    """Write a file beside ``path`` and rename it into place.
+
+    An interrupted write never leaves a truncated file at ``path``, and a
+    process that memory-mapped the old file keeps reading the old inode
+    instead of faulting on pages truncated under it.
+
+    Parameters
+    ----------
+    path : Path
+        Final destination.
+    write : Callable[[Path], None]
+        Writes the full contents to the temporary path it is given.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        write(Path(tmp_name))
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _write_index(index: faiss.Index, path: Path) -> None:
+    """Atomically write a FAISS index (see :func:`_replace_file`)."""
+    _replace_file(path, lambda tmp: faiss.write_index(index, str(tmp)))
+
+
+def reindex(
+    index_path: Path = config.INDEX_PATH,
+    index_type: str = config.FAISS_INDEX_TYPE,
+    output_path: Path | None = None,
+) -> faiss.Index:
+    """Rebuild a saved index as another type from its stored vectors.
+
+    Lets an existing flat ``index.faiss`` be converted to HNSW (or SQ8)
+    without the database or the embedding model. Vectors are reconstructed
+    from the source index, so the source should store them exactly (flat or
+    HNSW); reconstructing from SQ8 or IVF-PQ carries its quantization error
+    over.
+
+    Parameters
+    ----------
+    index_path : Path
+        Path of the index to convert.
+    index_type : str
+        Target index type passed to :func:`create_index`.
+    output_path : Path or None
+        Where to write the new index. Defaults to overwriting ``index_path``.
+
+    Returns
+    -------
+    faiss.Index
+        The rebuilt index.
+    """
+    source = faiss.read_index(str(index_path))
+    embeddings = source.reconstruct_n(0, source.ntotal)
+    index = index_embeddings(embeddings, source.d, index_type)
+    _write_index(index, output_path or index_path)
+    return index
+
+
+def embeddings_cache_path(texts: list[str], model_name: str, cache_dir: Path) -> Path:
+    """Return the cache file for the embeddings of ``texts`` under a model.
+
+    Parameters
+    ----------
+    texts : list[str]
+        Texts to embed, in index order.
+    model_name : str
+        Embedding model identifier.
+    cache_dir : Path
+        Directory holding cached embedding files.
+
+    Returns
+    -------
+    Path
+        ``.npy`` path keyed by a hash of the model, its ONNX file and the texts.
+    """
+    digest = hashlib.sha256()
+    for part in (model_name, config.ONNX_FILE_NAME, *texts):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    slug = model_name.replace("/", "__")
+    return cache_dir / f"{slug}_{digest.hexdigest()[:16]}.npy"
+
+
+def load_or_encode(
+    texts: list[str],
+    cache_path: Path,
+    model_loader: Callable[[], SentenceTransformer] = load_embedding_model,
+) -> np.ndarray:
+    """Load cached embeddings, or encode the texts and cache the result.
+
+    Parameters
+    ----------
+    texts : list[str]
+        Texts to embed.
+    cache_path : Path
+        Cache file from :func:`embeddings_cache_path`.
+    model_loader : Callable[[], SentenceTransformer]
+        Called to load the embedding model, only on a cache miss.
+
+    Returns
+    -------
+    np.ndarray
+        Embeddings of shape ``(len(texts), dimension)``. Cache hits are
+        memory-mapped read-only.
+    """
+    if cache_path.exists():
+        logger.info("Loading cached embeddings from %s", cache_path)
+        cached: np.ndarray = np.load(cache_path, mmap_mode="r")
+        return cached
+
+    logger.info("Loading embedding model...")
+    model = model_loader()
+    embeddings = encode_texts(model, texts)
+
+    def write(tmp: Path) -> None:
+        # A file object, since np.save appends ".npy" to other path suffixes
+        with open(tmp, "wb") as f:
+            np.save(f, embeddings)
+
+    # Atomic, so an interrupted run never leaves a truncated cache entry
+    _replace_file(cache_path, write)
+    return embeddings
+
+
 def save_artifacts(
     index: faiss.Index,
     mapping: list[dict[str, Any]],
@@ -109,16 +371,23 @@ def save_artifacts(
     mapping_path : Path
         Output path for the JSON mapping file.
     """
-    index_path.parent.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, str(index_path))
-    with open(mapping_path, "w", encoding="utf-8") as f:
-        json.dump(mapping, f, ensure_ascii=False, indent=2)
+    # Both files are replaced atomically: a running server keeps reading the
+    # old memory-mapped index instead of crashing on a truncated file.
+    _write_index(index, index_path)
+
+    def write_mapping(tmp: Path) -> None:
+        # Compact separators: no indentation whitespace to store or parse at startup
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(mapping, f, ensure_ascii=False, separators=(",", ":"))
+
+    _replace_file(mapping_path, write_mapping)
 
 
 def main(
     db_path: Path = config.DB_PATH,
     index_path: Path = config.INDEX_PATH,
     mapping_path: Path = config.MAPPING_PATH,
+    embeddings_cache_dir: Path = config.EMBEDDINGS_CACHE_DIR,
 ) -> None:
     """Run the full ingestion pipeline.
 
@@ -130,6 +399,10 @@ def main(
         Output path for the FAISS index.
     mapping_path : Path
         Output path for the JSON mapping.
+    embeddings_cache_dir : Path
+        Directory for cached corpus embeddings. Re-running ingestion on the
+        same verses and model (e.g. to try another ``FAISS_INDEX_TYPE``)
+        skips encoding.
     """
     logger.info("Fetching verses from %s", db_path)
     verses = fetch_verses(db_path)
@@ -138,16 +411,20 @@ def main(
     filtered = filter_verses(verses)
     logger.info("After filtering: %d", len(filtered))
 
+    # Fail before encoding and before any artifact is replaced: the app's
+    # per-book context ranges assume each book is one contiguous run.
+    check_books_contiguous(filtered)
+
     # filtered dicts serve as the mapping (schema: rowid, book, book_id,
     # book_title, chapter, chapter_id, chapter_title, verse, text)
     mapping = filtered
     texts = [v["text"] for v in filtered]
 
-    logger.info("Loading embedding model...")
-    model = load_embedding_model()
+    cache_path = embeddings_cache_path(texts, config.EMBEDDING_MODEL, embeddings_cache_dir)
+    embeddings = load_or_encode(texts, cache_path)
 
     logger.info("Building FAISS index...")
-    index = build_index(texts, model)
+    index = index_embeddings(embeddings)
     logger.info("Index size: %d", index.ntotal)
 
     logger.info("Saving artifacts to %s", index_path.parent)
@@ -156,5 +433,20 @@ def main(
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--reindex",
+        action="store_true",
+        help="rebuild the existing index as FAISS_INDEX_TYPE instead of re-ingesting",
+    )
+    args = parser.parse_args()
+
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
-    main()
+    if args.reindex:
+        logger.info("Rebuilding %s as %s", config.INDEX_PATH, config.FAISS_INDEX_TYPE)
+        reindex()
+        logger.info("Done.")
+    else:
+        main()
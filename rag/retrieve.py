@@ -1,6 +1,8 @@
 """Two-stage retrieval: FAISS vector search + cross-encoder reranking."""
 
 import json
+import sys
+from collections.abc import Callable
 from pathlib import Path
 from typing import Any
 
@@ -10,6 +12,17 @@ from sentence_transformers import CrossEncoder, SentenceTransformer
 
 import config
 from rag.embeddings import load_cross_encoder, load_embedding_model
+from rag.semantic_cache import SemanticCache
+
+# Mapping fields used at query time; the rest of the ingest schema is dropped on load
+MAPPING_FIELDS: tuple[str, ...] = ("book_id", "book_title", "chapter", "verse", "text")
+
+# IO_FLAG_MMAP_IFC maps flat/HNSW/SQ vector storage; releases that predate it
+# only offer IO_FLAG_MMAP (IVF inverted lists), which still loads every type.
+_INDEX_READ_FLAGS: int = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+# Shared by every GPU index copy; created on first use so CPU-only hosts never touch CUDA
+_gpu_resources: Any = None
 
 
 def normalize_scores(raw_scores: np.ndarray) -> np.ndarray:
@@ -23,9 +36,15 @@ def normalize_scores(raw_scores: np.ndarray) -> np.ndarray:
     Returns
     -------
     np.ndarray
-        Scores mapped to [0, 1] via sigmoid.
+        Float32 scores mapped to [0, 1] via sigmoid.
     """
-    return 1.0 / (1.0 + np.exp(-raw_scores))  # type: ignore[no-any-return]
+    # sigmoid(x) = (1 + tanh(x / 2)) / 2 cannot overflow, unlike exp(-x) for
+    # very negative x; one float32 buffer is reused in place throughout.
+    scores: np.ndarray = np.multiply(raw_scores, 0.5, dtype=np.float32)
+    np.tanh(scores, out=scores)
+    scores += 1.0
+    scores *= 0.5
+    return scores
 
 
 def load_pipeline(
@@ -49,7 +68,9 @@ def load_pipeline(
     idx_path = index_path or config.INDEX_PATH
     map_path = mapping_path or config.MAPPING_PATH
 
-    index = faiss.read_index(str(idx_path))
+    index = _read_index(idx_path)
+    _configure_index(index)
+    index = _maybe_to_gpu(index)
     mapping = _load_mapping(map_path)
     embed_model = load_embedding_model()
     cross_encoder = load_cross_encoder()
@@ -57,9 +78,77 @@ def load_pipeline(
     return index, mapping, embed_model, cross_encoder
 
 
+def _read_index(path: Path) -> faiss.Index:
+    """Read a FAISS index with its vector storage memory-mapped.
+
+    ``IO_FLAG_MMAP_IFC`` maps the file and points the flat, HNSW and
+    scalar-quantized storage straight at it, so the page cache backs the
+    vectors and processes share them instead of each holding a private copy.
+    (``IO_FLAG_MMAP`` alone only applies to IVF inverted lists; it is the
+    fallback on faiss releases without ``IO_FLAG_MMAP_IFC``.)
+
+    Parameters
+    ----------
+    path : Path
+        Path to the FAISS index file.
+
+    Returns
+    -------
+    faiss.Index
+        Index backed by the mapped file.
+    """
+    return faiss.read_index(str(path), _INDEX_READ_FLAGS)
+
+
+def _configure_index(index: faiss.Index) -> None:
+    """Apply query-time search parameters for approximate index types.
+
+    Parameters
+    ----------
+    index : faiss.Index
+        Index loaded from disk. Flat indexes are left unchanged.
+    """
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.FAISS_EF_SEARCH
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = config.FAISS_NPROBE
+
+
+def _maybe_to_gpu(index: faiss.Index) -> faiss.Index:
+    """Copy a flat index to the first GPU when one is available.
+
+    Only exact flat indexes are moved: HNSW has no GPU implementation and the
+    scalar-quantized types stay on CPU. With ``faiss-cpu`` or
+    ``config.FAISS_USE_GPU`` off, the index is returned unchanged.
+
+    Parameters
+    ----------
+    index : faiss.Index
+        Index loaded from disk.
+
+    Returns
+    -------
+    faiss.Index
+        GPU copy of ``index``, or ``index`` itself.
+    """
+    global _gpu_resources
+    if not config.FAISS_USE_GPU or not isinstance(index, faiss.IndexFlat):
+        return index
+    if getattr(faiss, "get_num_gpus", lambda: 0)() < 1:
+        return index
+    if _gpu_resources is None:
+        _gpu_resources = faiss.StandardGpuResources()
+    return faiss.index_cpu_to_gpu(_gpu_resources, 0, index)
+
+
 def _load_mapping(path: Path) -> list[dict[str, Any]]:
     """Load verse mapping from JSON file.
 
+    Only :data:`MAPPING_FIELDS` are kept, which keeps each record under the
+    dict resize threshold and cuts the in-memory mapping by about a third.
+    Book titles, chapters and verse numbers repeat across thousands of
+    records, so they are interned to share one string object per value.
+
     Parameters
     ----------
     path : Path
@@ -71,7 +160,18 @@ def _load_mapping(path: Path) -> list[dict[str, Any]]:
         Verse metadata records.
     """
     with open(path, encoding="utf-8") as f:
-        return json.load(f)  # type: ignore[no-any-return]
+        records: list[dict[str, Any]] = json.load(f)
+    intern = sys.intern
+    return [
+        {
+            "book_id": entry["book_id"],
+            "book_title": intern(entry["book_title"]),
+            "chapter": intern(entry["chapter"]),
+            "verse": intern(entry["verse"]),
+            "text": entry["text"],
+        }
+        for entry in records
+    ]
 
 
 def search(
@@ -82,6 +182,8 @@ def search(
     cross_encoder: CrossEncoder,
     faiss_top_k: int = config.FAISS_TOP_K,
     rerank_top_k: int = config.RERANK_TOP_K,
+    rerank_skip_margin: float | None = config.RERANK_SKIP_MARGIN,
+    cache: SemanticCache | None = None,
 ) -> list[dict[str, Any]]:
     """Run two-stage retrieval: FAISS search then cross-encoder reranking.
 
@@ -101,6 +203,10 @@ def search(
         Number of candidates to retrieve from FAISS.
     rerank_top_k : int
         Number of results to return after reranking.
+    rerank_skip_margin : float or None
+        See :func:`search_batch`. ``None`` always reranks.
+    cache : SemanticCache or None
+        See :func:`search_batch`.
 
     Returns
     -------
@@ -108,40 +214,231 @@ def search(
         Top results sorted by normalized score, each with book_title,
         chapter, verse, text, and score.
     """
-    query_clean = query.replace("\n", " ")
+    return search_batch(
+        [query],
+        index,
+        mapping,
+        embed_model,
+        cross_encoder,
+        faiss_top_k=faiss_top_k,
+        rerank_top_k=rerank_top_k,
+        rerank_skip_margin=rerank_skip_margin,
+        cache=cache,
+    )[0]
+
+
+def search_batch(
+    queries: list[str],
+    index: faiss.Index,
+    mapping: list[dict[str, Any]],
+    embed_model: SentenceTransformer,
+    cross_encoder: CrossEncoder,
+    faiss_top_k: int = config.FAISS_TOP_K,
+    rerank_top_k: int = config.RERANK_TOP_K,
+    rerank_skip_margin: float | None = config.RERANK_SKIP_MARGIN,
+    cache: SemanticCache | None = None,
+) -> list[list[dict[str, Any]]]:
+    """Run two-stage retrieval for several queries with one call per model.
+
+    All queries are encoded together, searched as a single FAISS matrix, and
+    every (query, candidate) pair is scored in one cross-encoder predict.
+    Queries whose FAISS top-1 similarity beats the ``rerank_top_k``-th by more
+    than ``rerank_skip_margin`` skip the cross-encoder and keep FAISS order,
+    scored by cosine similarity clipped to [0, 1]. With a ``cache``, queries
+    whose embedding matches a cached one skip FAISS and the cross-encoder.
+
+    Parameters
+    ----------
+    queries : list[str]
+        Search query strings.
+    index : faiss.Index
+        FAISS inner-product index.
+    mapping : list[dict[str, Any]]
+        Verse metadata mapping.
+    embed_model : SentenceTransformer
+        Embedding model for query encoding.
+    cross_encoder : CrossEncoder
+        Cross-encoder for reranking.
+    faiss_top_k : int
+        Number of candidates to retrieve from FAISS per query.
+    rerank_top_k : int
+        Number of results to return per query after reranking.
+    rerank_skip_margin : float or None
+        Similarity gap above which reranking is skipped. ``None`` always
+        reranks.
+    cache : SemanticCache or None
+        Semantic result cache, looked up after encoding and filled with the
+        results of cache misses. Must only be shared between calls with the
+        same ``faiss_top_k``, ``rerank_top_k`` and ``rerank_skip_margin``.
+
+    Returns
+    -------
+    list[list[dict[str, Any]]]
+        One result list per query, in input order, each as returned by
+        :func:`search`.
+    """
+    queries_clean = [q.replace("\n", " ") for q in queries]
 
-    query_embedding: np.ndarray = embed_model.encode(
-        [query_clean],
+    query_embeddings: np.ndarray = embed_model.encode(
+        queries_clean,
         normalize_embeddings=True,
         show_progress_bar=False,
     )
 
-    _, indices = index.search(query_embedding, faiss_top_k)
-    candidate_indices = indices[0]
+    cached = [cache.get(e) if cache is not None else None for e in query_embeddings]
+    misses = [i for i, hit in enumerate(cached) if hit is None]
+    if not misses:
+        return [hit for hit in cached if hit is not None]
+
+    similarities, indices = index.search(query_embeddings[misses], faiss_top_k)
+    # FAISS pads short result lists with -1; drop those in one pass
+    valid = (indices >= 0) & (indices < len(mapping))
+
+    # Pairs for reranked queries are flattened into one predict call;
+    # candidates_per_query records how to split the scores back.
+    pairs: list[tuple[str, str]] = []
+    candidates_per_query: list[tuple[list[dict[str, Any]], np.ndarray, bool]] = []
+    for i, candidate_sims, candidate_indices, row_valid in zip(
+        misses, similarities, indices, valid, strict=True
+    ):
+        candidates = [mapping[idx] for idx in candidate_indices[row_valid].tolist()]
+        sims_arr = np.asarray(candidate_sims[row_valid], dtype=np.float32)
+        rerank = not _faiss_is_decisive(sims_arr, rerank_top_k, rerank_skip_margin)
+        if rerank:
+            query_clean = queries_clean[i]
+            pairs.extend((query_clean, entry["text"].replace("\n", " ")) for entry in candidates)
+        candidates_per_query.append((candidates, sims_arr, rerank))
+
+    # Sigmoid and clipping are monotone, so candidates are ranked on raw
+    # scores and only the kept top-k are transformed.
+    raw_scores = _predict_length_sorted(cross_encoder, pairs)
+
+    offset = 0
+    for i, (candidates, sims_arr, rerank) in zip(misses, candidates_per_query, strict=True):
+        if rerank:
+            scores = raw_scores[offset : offset + len(candidates)]
+            offset += len(candidates)
+            ranked = _rank_candidates(candidates, scores, rerank_top_k, normalize_scores)
+        else:
+            ranked = _rank_candidates(candidates, sims_arr, rerank_top_k, _clip_similarity)
+        if cache is not None:
+            cache.put(query_embeddings[i], ranked)
+        cached[i] = ranked
+    return [hit for hit in cached if hit is not None]
+
 
-    candidates = []
-    for idx in candidate_indices:
-        idx_int = int(idx)
-        if 0 <= idx_int < len(mapping):
-            entry = mapping[idx_int]
-            text_clean = entry["text"].replace("\n", " ")
-            candidates.append((idx_int, text_clean, entry))
+def _predict_length_sorted(
+    cross_encoder: CrossEncoder,
+    pairs: list[tuple[str, str]],
+) -> np.ndarray:
+    """Score pairs with the cross-encoder, batching pairs of similar length.
+
+    Pairs are sorted by character length before prediction so each batch is
+    padded to a similar token count, then scores are restored to input order.
+
+    Parameters
+    ----------
+    cross_encoder : CrossEncoder
+        Cross-encoder for reranking.
+    pairs : list[tuple[str, str]]
+        (query, verse text) pairs.
 
-    pairs = [[query_clean, c[1]] for c in candidates]
-    raw_scores: np.ndarray = cross_encoder.predict(pairs)
-    normalized = normalize_scores(np.asarray(raw_scores, dtype=np.float32))
+    Returns
+    -------
+    np.ndarray
+        Raw float32 score for each pair, in input order.
+    """
+    if not pairs:
+        return np.empty(0, dtype=np.float32)
+    order = np.argsort([len(q) + len(t) for q, t in pairs], kind="stable")
+    sorted_scores = cross_encoder.predict(
+        [pairs[i] for i in order],
+        batch_size=config.RERANK_BATCH_SIZE,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+    scores = np.empty(len(pairs), dtype=np.float32)
+    scores[order] = sorted_scores
+    return scores
 
+
+def _faiss_is_decisive(
+    sims: np.ndarray,
+    rerank_top_k: int,
+    margin: float | None,
+) -> bool:
+    """Check whether the FAISS ranking is clear enough to skip reranking.
+
+    Parameters
+    ----------
+    sims : np.ndarray
+        FAISS similarities of the candidates, in descending order.
+    rerank_top_k : int
+        Number of results that will be returned.
+    margin : float or None
+        Minimum gap between the top-1 and the ``rerank_top_k``-th
+        similarity. ``None`` disables skipping.
+
+    Returns
+    -------
+    bool
+        True if the gap exceeds ``margin``.
+    """
+    if margin is None or rerank_top_k < 1 or len(sims) < rerank_top_k:
+        return False
+    return bool(sims[0] - sims[rerank_top_k - 1] > margin)
+
+
+def _clip_similarity(sims: np.ndarray) -> np.ndarray:
+    """Map FAISS cosine similarities to [0, 1] scores."""
+    clipped: np.ndarray = np.clip(sims, 0.0, 1.0)
+    return clipped
+
+
+def _rank_candidates(
+    candidates: list[dict[str, Any]],
+    scores: np.ndarray,
+    rerank_top_k: int,
+    transform: Callable[[np.ndarray], np.ndarray] | None = None,
+) -> list[dict[str, Any]]:
+    """Build result dicts for the best-scored candidates of one query.
+
+    The top ``rerank_top_k`` scores are selected with ``np.argpartition`` and
+    only those are sorted, transformed and turned into result dicts.
+
+    Parameters
+    ----------
+    candidates : list[dict[str, Any]]
+        Mapping entries retrieved by FAISS for the query.
+    scores : np.ndarray
+        Ranking score for each candidate.
+    rerank_top_k : int
+        Number of results to keep.
+    transform : Callable[[np.ndarray], np.ndarray] or None
+        Monotone map applied to the kept scores only (e.g.
+        :func:`normalize_scores`). None keeps them as is.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        Results sorted by descending score.
+    """
+    k = min(rerank_top_k, len(candidates))
+    if k <= 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    top_scores = scores[top] if transform is None else transform(scores[top])
     scored = []
-    for i, (_, _, entry) in enumerate(candidates):
+    for i, score in zip(top, top_scores, strict=True):
+        entry = candidates[i]
         scored.append(
             {
                 "book_title": entry["book_title"],
                 "chapter": entry["chapter"],
                 "verse": entry["verse"],
                 "text": entry["text"],
-                "score": float(normalized[i]),
+                "score": float(score),
             }
         )
-
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:rerank_top_k]
+    return scored
@@ -0,0 +1,95 @@
+"""Semantic cache of search results keyed by query embedding."""
+
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import faiss
+import numpy as np
+
+
+class SemanticCache:
+    """LRU cache returning stored results for near-duplicate query embeddings.
+
+    Cached query embeddings live in a FAISS inner-product index, so a lookup
+    is one nearest-neighbour search. A hit requires a cosine similarity of at
+    least ``threshold`` (embeddings must be L2-normalized). Entries are only
+    valid for the retrieval settings they were computed with.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of cached queries; the least recently used is evicted.
+    threshold : float
+        Minimum cosine similarity for a cached query to count as a hit.
+    """
+
+    def __init__(self, max_size: int, threshold: float) -> None:
+        self._max_size = max_size
+        self._threshold = threshold
+        self._entries: OrderedDict[int, list[dict[str, Any]]] = OrderedDict()
+        self._index: faiss.IndexIDMap2 | None = None
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached queries."""
+        return len(self._entries)
+
+    def get(self, embedding: np.ndarray) -> list[dict[str, Any]] | None:
+        """Return cached results for the closest query above the threshold.
+
+        Parameters
+        ----------
+        embedding : np.ndarray
+            L2-normalized query embedding of shape ``(dimension,)``.
+
+        Returns
+        -------
+        list[dict[str, Any]] or None
+            Cached results, or None on a miss.
+        """
+        with self._lock:
+            if self._index is None or not self._entries:
+                return None
+            sims, ids = self._index.search(_as_row(embedding), 1)
+            entry_id = int(ids[0, 0])
+            if entry_id < 0 or sims[0, 0] < self._threshold:
+                return None
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id]
+
+    def put(self, embedding: np.ndarray, results: list[dict[str, Any]]) -> None:
+        """Cache results for a query embedding, evicting the oldest if full.
+
+        Parameters
+        ----------
+        embedding : np.ndarray
+            L2-normalized query embedding of shape ``(dimension,)``.
+        results : list[dict[str, Any]]
+            Search results for the query.
+        """
+        if self._max_size <= 0:
+            return
+        row = _as_row(embedding)
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(row.shape[1]))
+            if len(self._entries) >= self._max_size:
+                oldest_id, _ = self._entries.popitem(last=False)
+                self._index.remove_ids(np.array([oldest_id], dtype=np.int64))  # type: ignore[arg-type]
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(row, np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = results
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+            self._index = None
+
+
+def _as_row(embedding: np.ndarray) -> np.ndarray:
+    """Reshape an embedding into the contiguous float32 row FAISS expects."""
+    return np.ascontiguousarray(embedding, dtype=np.float32).reshape(1, -1)
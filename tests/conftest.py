@@ -187,6 +187,16 @@ def _mock_search_results(relevant: bool = True) -> list[dict[str, Any]]:
     ]
 
 
+def _mock_pipeline_state() -> dict[str, Any]:
+    """Return a fresh loaded-pipeline dict so tests cannot leak state into each other."""
+    return {
+        "loaded": True,
+        "mapping": [],
+        "verse_index": {},
+        "book_ranges": {},
+    }
+
+
 def _mock_context(result: dict[str, Any], *_args: Any, **_kwargs: Any) -> list[dict[str, Any]]:
     """Return a single-verse context for mock tests."""
     return [
@@ -207,7 +217,7 @@ def mock_pipeline() -> Generator[None, None, None]:
     ready = threading.Event()
     ready.set()
     with (
-        patch("app.pipeline", {"loaded": True, "mapping": [], "verse_index": {}}),
+        patch("app.pipeline", _mock_pipeline_state()),
         patch("app.pipeline_ready", ready),
         patch("app._run_search", side_effect=lambda q: _mock_search_results(relevant=True)),
         patch("app.get_verse_context", side_effect=_mock_context),
@@ -226,7 +236,7 @@ def mock_pipeline_low_scores() -> Generator[None, None, None]:
     ready = threading.Event()
     ready.set()
     with (
-        patch("app.pipeline", {"loaded": True, "mapping": [], "verse_index": {}}),
+        patch("app.pipeline", _mock_pipeline_state()),
         patch("app.pipeline_ready", ready),
         patch("app._run_search", side_effect=lambda q: _mock_search_results(relevant=False)),
         patch("app.get_verse_context", side_effect=_mock_context),
@@ -261,9 +271,39 @@ def client(mock_pipeline: None) -> TestClient:
     return TestClient(fastapi_app)
 
 
+@pytest.fixture(scope="module")
+def live_client() -> Generator[TestClient, None, None]:
+    """FastAPI test client running the real lifespan, ready once per module."""
+    import threading
+    import time
+
+    from app import PIPELINE_LOADER_THREAD, pipeline_ready
+    from app import app as fastapi_app
+
+    with TestClient(fastapi_app) as real_client:
+        deadline = time.monotonic() + 600
+        while not pipeline_ready.wait(timeout=0.5):
+            # The loader logs and exits on failure without setting the event:
+            # fail as soon as its thread is gone instead of waiting out the timeout.
+            loader_alive = any(t.name == PIPELINE_LOADER_THREAD for t in threading.enumerate())
+            if not loader_alive and not pipeline_ready.is_set():
+                pytest.fail("pipeline loader thread exited without loading the pipeline")
+            assert time.monotonic() < deadline, "pipeline failed to load within 600 s"
+        yield real_client
+
+
 @pytest.fixture(scope="session")
 def pipeline() -> tuple:
     """Load retrieval pipeline once for all integration tests."""
     from rag.retrieve import load_pipeline
 
     return load_pipeline()
+
+
+@pytest.fixture(scope="session")
+def all_verses() -> list[dict[str, Any]]:
+    """Read every verse from bible.db once for all integration tests."""
+    import config
+    from rag.ingest import fetch_verses
+
+    return fetch_verses(config.DB_PATH)
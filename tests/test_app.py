@@ -5,7 +5,13 @@ from typing import Any
 import pytest
 from fastapi.testclient import TestClient
 
-from app import get_score_label, get_verse_context, sanitize_query
+from app import (
+    build_book_ranges,
+    build_verse_index,
+    get_score_label,
+    get_verse_context,
+    sanitize_query,
+)
 
 # -- Sanitize query unit tests --
 
@@ -21,6 +27,9 @@ class TestSanitizeQuery:
     def test_strips_null_bytes(self) -> None:
         assert sanitize_query("hello\x00world") == "helloworld"
 
+    def test_strips_control_chars(self) -> None:
+        assert sanitize_query("hel\x07lo\x1b wor\x7fld") == "hello world"
+
     def test_preserves_plain_text(self) -> None:
         assert sanitize_query("quel est l amour de Dieu") == "quel est l amour de Dieu"
 
@@ -31,6 +40,9 @@ class TestSanitizeQuery:
     def test_collapses_whitespace(self) -> None:
         assert sanitize_query("un   deux\t\ntrois") == "un deux trois"
 
+    def test_separator_controls_become_spaces(self) -> None:
+        assert sanitize_query("Jean\x1f3\x1e16") == "Jean 3 16"
+
 
 # -- Score label unit tests --
 
@@ -54,6 +66,9 @@ class TestGetScoreLabel:
         assert get_score_label(0.25) == "Non pertinent"
         assert get_score_label(0.0) == "Non pertinent"
 
+    def test_below_lowest_threshold(self) -> None:
+        assert get_score_label(-0.1) == "Non pertinent"
+
 
 # -- Endpoint tests (mocked pipeline) --
 
@@ -129,6 +144,17 @@ class TestSearchEndpoint:
         assert response.status_code == 200
         assert "text/html" in response.headers["content-type"]
 
+    def test_model_input_capped_at_max_query_length(self, client: TestClient) -> None:
+        from unittest.mock import MagicMock, patch
+
+        import config
+
+        mock_search = MagicMock(return_value=[])
+        with patch("app._run_search", mock_search):
+            client.post("/search", data={"query": "x" * 5000})
+        (query,) = mock_search.call_args.args
+        assert len(query) == config.MAX_QUERY_LENGTH
+
 
 @pytest.mark.unit
 class TestInputValidation:
@@ -201,68 +227,104 @@ def _make_mapping() -> list[dict[str, Any]]:
     return entries
 
 
-def _build_index(
-    mapping: list[dict[str, Any]],
-) -> dict[tuple[str, str, str], int]:
-    idx: dict[tuple[str, str, str], int] = {}
-    for i, e in enumerate(mapping):
-        idx[(e["book_title"], e["chapter"], e["verse"])] = i
-    return idx
-
-
 @pytest.mark.unit
 class TestGetVerseContext:
     def test_returns_surrounding_verses(self) -> None:
         mapping = _make_mapping()
-        verse_idx = _build_index(mapping)
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
         result = {"book_title": "BookA", "chapter": "1", "verse": "3", "text": "Verse A 3"}
-        ctx = get_verse_context(result, mapping, verse_idx, n=2)
+        ctx = get_verse_context(result, mapping, verse_idx, ranges, n=2)
         assert len(ctx) == 5
         verses = [c["verse"] for c in ctx]
         assert verses == ["1", "2", "3", "4", "5"]
 
     def test_book_bounded_no_cross_book(self) -> None:
         mapping = _make_mapping()
-        verse_idx = _build_index(mapping)
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
         result = {"book_title": "BookA", "chapter": "1", "verse": "5", "text": "Verse A 5"}
-        ctx = get_verse_context(result, mapping, verse_idx, n=2)
+        ctx = get_verse_context(result, mapping, verse_idx, ranges, n=2)
         for c in ctx:
             assert "BookB" not in c.get("text", "")
 
     def test_start_of_mapping(self) -> None:
         mapping = _make_mapping()
-        verse_idx = _build_index(mapping)
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
         result = {"book_title": "BookA", "chapter": "1", "verse": "1", "text": "Verse A 1"}
-        ctx = get_verse_context(result, mapping, verse_idx, n=2)
+        ctx = get_verse_context(result, mapping, verse_idx, ranges, n=2)
         assert ctx[0]["is_match"] is True
         assert len(ctx) == 3
 
     def test_end_of_mapping(self) -> None:
         mapping = _make_mapping()
-        verse_idx = _build_index(mapping)
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
         result = {"book_title": "BookB", "chapter": "2", "verse": "3", "text": "Verse B 3"}
-        ctx = get_verse_context(result, mapping, verse_idx, n=2)
+        ctx = get_verse_context(result, mapping, verse_idx, ranges, n=2)
         assert ctx[-1]["is_match"] is True
         assert len(ctx) == 3
 
     def test_verse_not_in_index_fallback(self) -> None:
         mapping = _make_mapping()
-        verse_idx = _build_index(mapping)
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
         result = {"book_title": "Unknown", "chapter": "99", "verse": "1", "text": "Mystery"}
-        ctx = get_verse_context(result, mapping, verse_idx, n=2)
+        ctx = get_verse_context(result, mapping, verse_idx, ranges, n=2)
         assert len(ctx) == 1
         assert ctx[0]["is_match"] is True
         assert ctx[0]["text"] == "Mystery"
 
     def test_exactly_one_match(self) -> None:
         mapping = _make_mapping()
-        verse_idx = _build_index(mapping)
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
         result = {"book_title": "BookA", "chapter": "1", "verse": "3", "text": "Verse A 3"}
-        ctx = get_verse_context(result, mapping, verse_idx, n=2)
+        ctx = get_verse_context(result, mapping, verse_idx, ranges, n=2)
         matches = [c for c in ctx if c["is_match"]]
         assert len(matches) == 1
 
 
+@pytest.mark.unit
+class TestBuildBookRanges:
+    def test_range_per_book(self) -> None:
+        assert build_book_ranges(_make_mapping()) == {1: (0, 4), 2: (5, 7)}
+
+    def test_empty_mapping(self) -> None:
+        assert build_book_ranges([]) == {}
+
+    def test_non_contiguous_book_returns_none(self) -> None:
+        mapping = _make_mapping()
+        mapping.append({**mapping[0], "verse": "6", "text": "Verse A 6"})
+        assert build_book_ranges(mapping) is None
+
+    def test_context_without_ranges_stays_in_book(self) -> None:
+        mapping = _make_mapping()
+        mapping.append({**mapping[0], "verse": "6", "text": "Verse A 6"})
+        verse_idx = build_verse_index(mapping)
+        result = {"book_title": "BookB", "chapter": "2", "verse": "3", "text": "Verse B 3"}
+        ctx = get_verse_context(result, mapping, verse_idx, None, n=2)
+        assert [c["text"] for c in ctx] == ["Verse B 1", "Verse B 2", "Verse B 3"]
+
+    def test_context_without_ranges_matches_ranges(self) -> None:
+        mapping = _make_mapping()
+        verse_idx = build_verse_index(mapping)
+        ranges = build_book_ranges(mapping)
+        for entry in mapping:
+            ctx = get_verse_context(entry, mapping, verse_idx, None, n=2)
+            assert ctx == get_verse_context(entry, mapping, verse_idx, ranges, n=2)
+
+
+@pytest.mark.unit
+class TestBuildVerseIndex:
+    def test_maps_reference_to_position(self) -> None:
+        index = build_verse_index(_make_mapping())
+        assert len(index) == 8
+        assert index[("BookA", "1", "1")] == 0
+        assert index[("BookB", "2", "3")] == 7
+
+
 # -- Adversarial input tests --
 
 
@@ -314,6 +376,7 @@ class TestSearchCache:
         "mapping": [],
         "embed_model": "emb",
         "cross_encoder": "ce",
+        "semantic_cache": None,
     }
 
     def test_repeated_query_hits_cache(self) -> None:
@@ -323,10 +386,12 @@ class TestSearchCache:
         from app import _run_search, _run_search_cached
 
         _run_search_cached.cache_clear()
-        mock_search = MagicMock(return_value=[{"score": 0.9, "text": "v"}])
+        mock_search = MagicMock(
+            side_effect=lambda qs, *a, **kw: [[{"score": 0.9, "text": "v"}] for _ in qs]
+        )
         with (
             patch("app.pipeline", self._fake_pipeline),
-            patch("app._search", mock_search),
+            patch("app._search_batch", mock_search),
         ):
             r1 = _run_search("amour de Dieu")
             r2 = _run_search("amour de Dieu")
@@ -340,10 +405,12 @@ class TestSearchCache:
         from app import _run_search, _run_search_cached
 
         _run_search_cached.cache_clear()
-        mock_search = MagicMock(side_effect=lambda q, *a: [{"score": 0.9, "text": q}])
+        mock_search = MagicMock(
+            side_effect=lambda qs, *a, **kw: [[{"score": 0.9, "text": q}] for q in qs]
+        )
         with (
             patch("app.pipeline", self._fake_pipeline),
-            patch("app._search", mock_search),
+            patch("app._search_batch", mock_search),
         ):
             r1 = _run_search("query a")
             r2 = _run_search("query b")
@@ -357,10 +424,12 @@ class TestSearchCache:
         from app import _run_search, _run_search_cached
 
         _run_search_cached.cache_clear()
-        mock_search = MagicMock(return_value=[{"score": 0.9, "text": "v"}])
+        mock_search = MagicMock(
+            side_effect=lambda qs, *a, **kw: [[{"score": 0.9, "text": "v"}] for _ in qs]
+        )
         with (
             patch("app.pipeline", self._fake_pipeline),
-            patch("app._search", mock_search),
+            patch("app._search_batch", mock_search),
         ):
             r1 = _run_search("cache test")
             r1[0]["mutated"] = True
@@ -368,16 +437,57 @@ class TestSearchCache:
         assert "mutated" not in r2[0]
 
 
+# -- Pipeline warmup tests --
+
+
+@pytest.mark.unit
+class TestWarmupPipeline:
+    _fake_pipeline: dict[str, Any] = {
+        "index": "idx",
+        "mapping": [],
+        "embed_model": "emb",
+        "cross_encoder": "ce",
+    }
+
+    def test_runs_one_uncached_search(self) -> None:
+        """Warmup should rerank the warmup query without touching any cache."""
+        from unittest.mock import MagicMock, patch
+
+        import config
+        from app import _warmup_pipeline
+
+        mock_search = MagicMock(return_value=[[]])
+        with (
+            patch("app.pipeline", self._fake_pipeline),
+            patch("app._search_batch", mock_search),
+        ):
+            _warmup_pipeline()
+        mock_search.assert_called_once_with(
+            [config.WARMUP_QUERY], "idx", [], "emb", "ce", rerank_skip_margin=None
+        )
+
+    def test_failure_is_swallowed(self) -> None:
+        """A failing warmup must not prevent the pipeline from becoming ready."""
+        from unittest.mock import MagicMock, patch
+
+        from app import _warmup_pipeline
+
+        mock_search = MagicMock(side_effect=RuntimeError("boom"))
+        with (
+            patch("app.pipeline", self._fake_pipeline),
+            patch("app._search_batch", mock_search),
+        ):
+            _warmup_pipeline()
+        assert mock_search.call_count == 1
+
+
 # -- Integration test --
 
 
 @pytest.mark.integration
-def test_search_integration_real_pipeline() -> None:
+def test_search_integration_real_pipeline(live_client: TestClient) -> None:
     """End-to-end test with real models and FAISS index."""
-    from app import app as fastapi_app
-
-    with TestClient(fastapi_app) as real_client:
-        response = real_client.post("/search", data={"query": "quel est l amour de Dieu"})
-        assert response.status_code == 200
-        assert "text/html" in response.headers["content-type"]
-        assert "result-card" in response.text
+    response = live_client.post("/search", data={"query": "quel est l amour de Dieu"})
+    assert response.status_code == 200
+    assert "text/html" in response.headers["content-type"]
+    assert "result-card" in response.text
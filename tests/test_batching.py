@@ -0,0 +1,129 @@
+import threading
+
+import pytest
+
+from rag.batching import MicroBatcher
+
+
+@pytest.mark.unit
+def test_submit_returns_result_for_item() -> None:
+    """A single submission gets its own result back."""
+    batcher: MicroBatcher[int, int] = MicroBatcher(
+        lambda xs: [x * 2 for x in xs], window_s=0.0, max_size=4
+    )
+    try:
+        assert batcher.submit(21) == 42
+    finally:
+        batcher.stop()
+
+
+@pytest.mark.unit
+def test_concurrent_submissions_are_coalesced() -> None:
+    """Items submitted within the window run in one batched call."""
+    batch_sizes: list[int] = []
+    release = threading.Event()
+
+    def fn(xs: list[int]) -> list[int]:
+        batch_sizes.append(len(xs))
+        release.wait(timeout=5)
+        return [x + 1 for x in xs]
+
+    batcher: MicroBatcher[int, int] = MicroBatcher(fn, window_s=0.5, max_size=4)
+    results: dict[int, int] = {}
+
+    def worker(x: int) -> None:
+        results[x] = batcher.submit(x)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+    batcher.stop()
+
+    assert results == {0: 1, 1: 2, 2: 3, 3: 4}
+    assert batch_sizes == [4]
+
+
+@pytest.mark.unit
+def test_batch_respects_max_size() -> None:
+    """No batch holds more than max_size items."""
+    batch_sizes: list[int] = []
+    batcher: MicroBatcher[int, int] = MicroBatcher(
+        lambda xs: batch_sizes.append(len(xs)) or xs, window_s=0.2, max_size=2
+    )
+    threads = [threading.Thread(target=batcher.submit, args=(i,)) for i in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    batcher.stop()
+
+    assert sum(batch_sizes) == 5
+    assert max(batch_sizes) <= 2
+
+
+@pytest.mark.unit
+def test_exception_propagates_to_caller() -> None:
+    """Errors raised by the batched function surface in submit."""
+
+    def fn(xs: list[int]) -> list[int]:
+        raise RuntimeError("boom")
+
+    batcher: MicroBatcher[int, int] = MicroBatcher(fn, window_s=0.0, max_size=4)
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            batcher.submit(1)
+    finally:
+        batcher.stop()
+
+
+@pytest.mark.unit
+def test_failed_batch_retries_items_individually() -> None:
+    """One bad item in a batch does not fail the other callers."""
+
+    def fn(xs: list[int]) -> list[int]:
+        if -1 in xs:
+            raise ValueError("bad item")
+        return xs
+
+    batcher: MicroBatcher[int, int] = MicroBatcher(fn, window_s=0.5, max_size=2)
+    results: dict[int, object] = {}
+
+    def worker(x: int) -> None:
+        try:
+            results[x] = batcher.submit(x)
+        except ValueError as exc:
+            results[x] = exc
+
+    threads = [threading.Thread(target=worker, args=(x,)) for x in (7, -1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    batcher.stop()
+
+    assert results[7] == 7
+    assert isinstance(results[-1], ValueError)
+
+
+@pytest.mark.unit
+def test_wrong_result_count_raises() -> None:
+    """A batched function returning the wrong number of results fails the call."""
+    batcher: MicroBatcher[int, int] = MicroBatcher(lambda xs: [], window_s=0.0, max_size=4)
+    try:
+        with pytest.raises(ValueError, match="Expected 1 results"):
+            batcher.submit(1)
+    finally:
+        batcher.stop()
+
+
+@pytest.mark.unit
+def test_restarts_after_stop() -> None:
+    """Submitting after stop starts a fresh worker."""
+    batcher: MicroBatcher[int, int] = MicroBatcher(lambda xs: xs, window_s=0.0, max_size=4)
+    assert batcher.submit(1) == 1
+    batcher.stop()
+    assert batcher.submit(2) == 2
+    batcher.stop()
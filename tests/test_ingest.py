@@ -1,27 +1,59 @@
 from pathlib import Path
 from typing import Any
 
+import numpy as np
 import pytest
 
 import config
 
 
+class FakeModel:
+    """Return reproducible L2-normalized embeddings."""
+
+    def __init__(self, dimension: int = 16) -> None:
+        self.dimension = dimension
+
+    def encode(self, texts: list[str], **kwargs: object) -> np.ndarray:
+        rng = np.random.default_rng(len(texts))
+        out = rng.standard_normal((len(texts), self.dimension)).astype(np.float32)
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
 @pytest.mark.integration
-def test_fetch_verses_returns_all_rows() -> None:
+def test_fetch_verses_returns_all_rows(all_verses: list[dict[str, Any]]) -> None:
     """fetch_verses reads all rows from bible.db."""
-    from rag.ingest import fetch_verses
-
-    verses = fetch_verses(config.DB_PATH)
-    assert len(verses) == 35480
+    assert len(all_verses) == 35480
 
 
 @pytest.mark.integration
-def test_fetch_verses_has_rowid() -> None:
+def test_fetch_verses_has_rowid(all_verses: list[dict[str, Any]]) -> None:
     """Each verse dict includes a rowid key."""
-    from rag.ingest import fetch_verses
+    assert "rowid" in all_verses[0]
 
-    verses = fetch_verses(config.DB_PATH)
-    assert "rowid" in verses[0]
+
+@pytest.mark.unit
+def test_fetch_verses_returns_dicts(
+    tmp_data_dir: Path,
+    sample_verses: list[dict[str, Any]],
+) -> None:
+    """fetch_verses returns one dict per row keyed by column name."""
+    import sqlite3
+
+    from rag.ingest import VERSE_COLUMNS, fetch_verses
+
+    db_path = tmp_data_dir / "bible.db"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            "CREATE TABLE verses (book, book_id, book_title, chapter, chapter_id, "
+            "chapter_title, verse, text)"
+        )
+        conn.executemany(
+            f"INSERT INTO verses (rowid, {', '.join(VERSE_COLUMNS[1:])}) "
+            f"VALUES ({', '.join('?' * len(VERSE_COLUMNS))})",
+            [tuple(v[c] for c in VERSE_COLUMNS) for v in sample_verses],
+        )
+
+    assert fetch_verses(db_path) == sorted(sample_verses, key=lambda v: v["rowid"])
 
 
 @pytest.mark.unit
@@ -66,6 +98,247 @@ def test_filter_verses_keeps_valid(
     assert any("lumière" in t for t in texts)
 
 
+@pytest.mark.unit
+def test_filter_verses_counts_whitespace_separated_words() -> None:
+    """Runs of spaces, tabs and newlines count as a single word separator."""
+    from rag.ingest import filter_verses
+
+    verses = [{"text": "un      deux      "}, {"text": "un\tdeux\ntrois"}]
+    result = filter_verses(verses, min_length=10, min_words=3)
+    assert [v["text"] for v in result] == ["un\tdeux\ntrois"]
+
+
+@pytest.mark.unit
+def test_check_books_contiguous_accepts_ordered_books() -> None:
+    """Books that each form a single run pass the check."""
+    from rag.ingest import check_books_contiguous
+
+    check_books_contiguous([{"book_id": 1}, {"book_id": 1}, {"book_id": 2}])
+    check_books_contiguous([])
+
+
+@pytest.mark.unit
+def test_check_books_contiguous_rejects_reappearing_book() -> None:
+    """A book that reappears after another book is rejected before indexing."""
+    from rag.ingest import check_books_contiguous
+
+    with pytest.raises(ValueError, match="Book 1 is not contiguous.*index 2"):
+        check_books_contiguous([{"book_id": 1}, {"book_id": 2}, {"book_id": 1}])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "sq8", "sqfp16"])
+def test_build_index_types(index_type: str) -> None:
+    """build_index adds every text and uses the inner-product metric."""
+    import faiss
+
+    from rag.ingest import build_index
+
+    texts = [f"verset {i}" for i in range(50)]
+    index = build_index(texts, FakeModel(), dimension=16, index_type=index_type)  # type: ignore[arg-type]
+    assert index.ntotal == len(texts)
+    assert index.is_trained
+    assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("index_type", ["sq8", "sqfp16"])
+def test_scalar_quantized_index_preserves_top_ranking(index_type: str) -> None:
+    """Quantized search on held-out queries mostly agrees with exact search.
+
+    Scalar quantization is lossy, so near-ties may swap: the check is a recall
+    bound rather than identical ids.
+    """
+    from rag.ingest import create_index
+
+    k = 10
+    vectors = FakeModel().encode([f"v{i}" for i in range(200)])
+    exact = create_index(16, "flat")
+    exact.add(vectors)
+    quantized = create_index(16, index_type)
+    quantized.train(vectors)
+    quantized.add(vectors)
+
+    # Different batch size, different seed: queries are not indexed vectors
+    queries = FakeModel().encode([f"q{i}" for i in range(50)])
+    _, exact_ids = exact.search(queries, k)
+    _, quantized_ids = quantized.search(queries, k)
+
+    top1_agreement = np.mean(quantized_ids[:, 0] == exact_ids[:, 0])
+    recall = np.mean(
+        [len(set(q) & set(e)) / k for q, e in zip(quantized_ids, exact_ids, strict=True)]
+    )
+    assert top1_agreement >= 0.9
+    assert recall >= 0.9
+
+
+@pytest.mark.unit
+def test_hnsw_index_finds_exact_match() -> None:
+    """Searching with a stored vector returns that vector first."""
+    from rag.ingest import create_index
+
+    vectors = FakeModel().encode([f"v{i}" for i in range(200)])
+    index = create_index(16, "hnsw")
+    index.add(vectors)
+    _, ids = index.search(vectors[:5], 1)
+    assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.unit
+def test_ivfpq_index_uses_configured_layout() -> None:
+    """IVF-PQ is built from FAISS_IVF_NLIST / FAISS_PQ_M and trained before add."""
+    from unittest.mock import patch
+
+    import faiss
+
+    from rag.ingest import index_embeddings
+
+    vectors = FakeModel().encode([f"v{i}" for i in range(300)])
+    with (
+        patch.object(config, "FAISS_IVF_NLIST", 4),
+        patch.object(config, "FAISS_PQ_M", 4),
+    ):
+        index = index_embeddings(vectors, 16, "ivfpq")
+    ivf = faiss.extract_index_ivf(index)
+    assert ivf.nlist == 4
+    assert index.ntotal == len(vectors)
+    assert index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+@pytest.mark.unit
+def test_create_index_rejects_unknown_type() -> None:
+    """An unsupported index type raises ValueError."""
+    from rag.ingest import create_index
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        create_index(16, "annoy")
+
+
+@pytest.mark.unit
+def test_save_artifacts_roundtrip(tmp_data_dir: Path, sample_verses: list[dict[str, Any]]) -> None:
+    """Saved mapping is compact JSON that loads back unchanged."""
+    import json
+
+    import faiss
+
+    from rag.ingest import save_artifacts
+
+    index_path = tmp_data_dir / "index.faiss"
+    mapping_path = tmp_data_dir / "mapping.json"
+    save_artifacts(faiss.IndexFlatIP(4), sample_verses, index_path, mapping_path)
+
+    raw = mapping_path.read_text(encoding="utf-8")
+    assert "\n " not in raw
+    assert "Genèse" in raw
+    assert json.loads(raw) == sample_verses
+    assert faiss.read_index(str(index_path)).d == 4
+
+
+@pytest.mark.unit
+def test_reindex_converts_flat_to_hnsw(tmp_data_dir: Path) -> None:
+    """A saved flat index is rebuilt as HNSW with the same vectors."""
+    import faiss
+    import numpy as np
+
+    from rag.ingest import reindex
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    flat = faiss.IndexFlatIP(16)
+    flat.add(vectors)
+    index_path = tmp_data_dir / "index.faiss"
+    faiss.write_index(flat, str(index_path))
+
+    reindex(index_path, "hnsw")
+
+    rebuilt = faiss.read_index(str(index_path))
+    assert isinstance(rebuilt, faiss.IndexHNSWFlat)
+    assert rebuilt.ntotal == 50
+    _, ids = rebuilt.search(vectors[:5], 1)
+    assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.unit
+def test_rewrites_keep_mmap_loaded_index_searchable(
+    tmp_data_dir: Path, sample_verses: list[dict[str, Any]]
+) -> None:
+    """reindex and save_artifacts replace index.faiss without truncating a mapped copy."""
+    import faiss
+
+    from rag.ingest import reindex, save_artifacts
+    from rag.retrieve import _read_index
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    flat = faiss.IndexFlatIP(16)
+    flat.add(vectors)
+    index_path = tmp_data_dir / "index.faiss"
+    faiss.write_index(flat, str(index_path))
+    served = _read_index(index_path)
+
+    reindex(index_path, "hnsw")
+    save_artifacts(flat, sample_verses, index_path, tmp_data_dir / "mapping.json")
+
+    _, ids = served.search(vectors[:5], 1)
+    assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert sorted(p.name for p in tmp_data_dir.iterdir()) == ["index.faiss", "mapping.json"]
+
+
+@pytest.mark.unit
+def test_embeddings_cache_path_depends_on_texts_and_model(tmp_data_dir: Path) -> None:
+    """Changing the texts or the model yields a different cache file."""
+    from rag.ingest import embeddings_cache_path
+
+    base = embeddings_cache_path(["a", "b"], "org/model", tmp_data_dir)
+    assert base == embeddings_cache_path(["a", "b"], "org/model", tmp_data_dir)
+    assert base != embeddings_cache_path(["a", "c"], "org/model", tmp_data_dir)
+    assert base != embeddings_cache_path(["ab"], "org/model", tmp_data_dir)
+    assert base != embeddings_cache_path(["a", "b"], "org/other", tmp_data_dir)
+    assert base.parent == tmp_data_dir
+    assert base.suffix == ".npy"
+
+
+@pytest.mark.unit
+def test_load_or_encode_reuses_cache(tmp_data_dir: Path) -> None:
+    """The model is only loaded on a cache miss; hits return the same vectors."""
+    from rag.ingest import load_or_encode
+
+    loads: list[int] = []
+
+    def loader() -> FakeModel:
+        loads.append(1)
+        return FakeModel()
+
+    texts = [f"verset {i}" for i in range(10)]
+    cache_path = tmp_data_dir / "cache" / "emb.npy"
+    first = load_or_encode(texts, cache_path, loader)  # type: ignore[arg-type]
+    second = load_or_encode(texts, cache_path, loader)  # type: ignore[arg-type]
+
+    assert len(loads) == 1
+    assert cache_path.exists()
+    np.testing.assert_array_equal(first, second)
+
+
+@pytest.mark.unit
+def test_load_or_encode_interrupted_write_leaves_no_cache(tmp_data_dir: Path) -> None:
+    """A failed cache write leaves neither a truncated cache nor a temp file."""
+    from unittest.mock import patch
+
+    from rag.ingest import load_or_encode
+
+    cache_dir = tmp_data_dir / "cache"
+    cache_path = cache_dir / "emb.npy"
+    with (
+        patch("numpy.save", side_effect=KeyboardInterrupt),
+        pytest.raises(KeyboardInterrupt),
+    ):
+        load_or_encode(["verset 1"], cache_path, FakeModel)  # type: ignore[arg-type]
+
+    assert list(cache_dir.iterdir()) == []
+
+
 @pytest.mark.integration
 def test_ingest_creates_artifacts(tmp_data_dir: Path) -> None:
     """Full ingestion creates index.faiss and mapping.json with matching sizes."""
@@ -82,6 +355,7 @@ def test_ingest_creates_artifacts(tmp_data_dir: Path) -> None:
         db_path=config.DB_PATH,
         index_path=index_path,
         mapping_path=mapping_path,
+        embeddings_cache_dir=tmp_data_dir / "embeddings_cache",
     )
 
     assert index_path.exists()
@@ -48,44 +48,40 @@ def test_forgiveness_query_multiple_books(
     assert len(books) >= 2
 
 
+QUERIES = [
+    "création du monde",
+    "le pardon et la miséricorde",
+    "la résurrection des morts",
+    "aimer son prochain",
+]
+
+
 @pytest.mark.integration
+@pytest.mark.parametrize("query", QUERIES)
 def test_all_scores_in_range(
     pipeline: tuple[faiss.Index, list[dict[str, Any]], SentenceTransformer, CrossEncoder],
+    query: str,
 ) -> None:
     """All result scores are between 0.0 and 1.0."""
     from rag.retrieve import search
 
     index, mapping, embed_model, cross_encoder = pipeline
-
-    queries = [
-        "création du monde",
-        "le pardon et la miséricorde",
-        "la résurrection des morts",
-        "aimer son prochain",
-    ]
-    for query in queries:
-        results = search(query, index, mapping, embed_model, cross_encoder)
-        for r in results:
-            assert 0.0 <= r["score"] <= 1.0, f"Score {r['score']} out of range for '{query}'"
+    results = search(query, index, mapping, embed_model, cross_encoder)
+    for r in results:
+        assert 0.0 <= r["score"] <= 1.0, f"Score {r['score']} out of range for '{query}'"
 
 
 @pytest.mark.integration
+@pytest.mark.parametrize("query", QUERIES)
 def test_search_time_under_2_seconds(
     pipeline: tuple[faiss.Index, list[dict[str, Any]], SentenceTransformer, CrossEncoder],
+    query: str,
 ) -> None:
     """Each search completes in under 2 seconds."""
     from rag.retrieve import search
 
     index, mapping, embed_model, cross_encoder = pipeline
-
-    queries = [
-        "création du monde",
-        "le pardon et la miséricorde",
-        "la résurrection des morts",
-        "aimer son prochain",
-    ]
-    for query in queries:
-        start = time.time()
-        search(query, index, mapping, embed_model, cross_encoder)
-        elapsed = time.time() - start
-        assert elapsed < 2.0, f"Search for '{query}' took {elapsed:.2f}s"
+    start = time.time()
+    search(query, index, mapping, embed_model, cross_encoder)
+    elapsed = time.time() - start
+    assert elapsed < 2.0, f"Search for '{query}' took {elapsed:.2f}s"
@@ -1,5 +1,65 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import faiss
 import numpy as np
 import pytest
+from sentence_transformers import CrossEncoder, SentenceTransformer
+
+DIM = 4
+
+Pipeline = tuple[faiss.Index, list[dict[str, Any]], SentenceTransformer, CrossEncoder]
+
+
+def _fake_mapping() -> list[dict[str, Any]]:
+    """Four verses whose embeddings are the unit basis vectors."""
+    return [
+        {
+            "book_id": 1,
+            "book_title": "BookA",
+            "chapter": "1",
+            "verse": str(i + 1),
+            "text": f"verse\n{i}",
+        }
+        for i in range(DIM)
+    ]
+
+
+def _fake_index() -> faiss.Index:
+    index = faiss.IndexFlatIP(DIM)
+    index.add(np.eye(DIM, dtype=np.float32))
+    return index
+
+
+class FakeEmbedModel:
+    """Embed query "qN" close to basis vector N, with a little weight on the others."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def encode(self, texts: list[str], **kwargs: object) -> np.ndarray:
+        self.calls.append(list(texts))
+        out = np.full((len(texts), DIM), 0.1, dtype=np.float32)
+        for row, text in enumerate(texts):
+            out[row, int(text[1:])] = 1.0
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+class FakeCrossEncoder:
+    """Score a pair higher when the verse number matches the query number."""
+
+    def __init__(self) -> None:
+        self.calls: list[list[tuple[str, str]]] = []
+        self.kwargs: list[dict[str, object]] = []
+
+    def predict(self, pairs: list[tuple[str, str]], **kwargs: object) -> np.ndarray:
+        self.calls.append(list(pairs))
+        self.kwargs.append(kwargs)
+        return np.array(
+            [5.0 if q[1:] == t.split()[-1] else -float(t.split()[-1]) for q, t in pairs],
+            dtype=np.float32,
+        )
 
 
 @pytest.mark.unit
@@ -13,6 +73,17 @@ def test_normalize_scores_sigmoid() -> None:
     np.testing.assert_allclose(result, expected, atol=1e-6)
 
 
+@pytest.mark.unit
+def test_normalize_scores_leaves_input_untouched() -> None:
+    """The sigmoid is computed in a new float32 buffer."""
+    from rag.retrieve import normalize_scores
+
+    raw = np.array([-2.0, 0.0, 2.0])
+    result = normalize_scores(raw)
+    np.testing.assert_array_equal(raw, [-2.0, 0.0, 2.0])
+    assert result.dtype == np.float32
+
+
 @pytest.mark.unit
 def test_normalize_scores_zero_maps_to_half() -> None:
     """Raw score 0.0 maps to normalized 0.5."""
@@ -40,33 +111,413 @@ def test_normalize_scores_large_negative() -> None:
     assert result[0] < 0.001
 
 
+@pytest.mark.unit
+def test_normalize_scores_extreme_logits_do_not_overflow() -> None:
+    """Logits far outside float32 exp range saturate without warnings."""
+    import warnings
+
+    from rag.retrieve import normalize_scores
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = normalize_scores(np.array([-1000.0, 1000.0], dtype=np.float32))
+    np.testing.assert_array_equal(result, [0.0, 1.0])
+
+
+@pytest.mark.unit
+def test_search_ranks_by_cross_encoder_score() -> None:
+    """Results are ordered by cross-encoder score and truncated to rerank_top_k."""
+    from rag.retrieve import search
+
+    results = search(
+        "q2",
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        FakeCrossEncoder(),  # type: ignore[arg-type]
+        faiss_top_k=4,
+        rerank_top_k=3,
+        rerank_skip_margin=None,
+    )
+    assert [r["verse"] for r in results] == ["3", "1", "2"]
+    assert results[0]["text"] == "verse\n2"
+    assert {"book_title", "chapter", "verse", "text", "score"} <= set(results[0])
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0.0 <= s <= 1.0 for s in scores)
+
+
+@pytest.mark.unit
+def test_search_drops_faiss_padding() -> None:
+    """Asking FAISS for more candidates than indexed drops its -1 padding."""
+    from rag.retrieve import search
+
+    cross_encoder = FakeCrossEncoder()
+    results = search(
+        "q1",
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        cross_encoder,  # type: ignore[arg-type]
+        faiss_top_k=DIM + 3,
+        rerank_top_k=DIM + 3,
+        rerank_skip_margin=None,
+    )
+    assert len(cross_encoder.calls[0]) == DIM
+    assert sorted(r["verse"] for r in results) == ["1", "2", "3", "4"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("k", [0, 2, 10])
+def test_rank_candidates_keeps_top_k_in_order(k: int) -> None:
+    """Only the k best candidates are returned, highest score first."""
+    from rag.retrieve import _rank_candidates
+
+    mapping = _fake_mapping()
+    scores = np.array([0.2, 0.9, 0.1, 0.5], dtype=np.float32)
+    ranked = _rank_candidates(mapping, scores, k)
+    assert [r["verse"] for r in ranked] == ["2", "4", "1", "3"][:k]
+    assert [r["score"] for r in ranked] == sorted(float(s) for s in scores)[::-1][:k]
+
+
+@pytest.mark.unit
+def test_rank_candidates_transforms_only_kept_scores() -> None:
+    """The transform sees the top-k scores only, already in ranked order."""
+    from rag.retrieve import _rank_candidates
+
+    seen: list[list[float]] = []
+
+    def transform(scores: np.ndarray) -> np.ndarray:
+        seen.append(scores.tolist())
+        return scores / 10
+
+    scores = np.array([1.0, 4.0, -2.0, 3.0], dtype=np.float32)
+    ranked = _rank_candidates(_fake_mapping(), scores, 2, transform)
+    assert seen == [[4.0, 3.0]]
+    assert [r["score"] for r in ranked] == pytest.approx([0.4, 0.3])
+
+
+@pytest.mark.unit
+def test_search_batch_one_call_per_model() -> None:
+    """A batch of queries is encoded and reranked with a single call each."""
+    from rag.retrieve import search, search_batch
+
+    embed_model, cross_encoder = FakeEmbedModel(), FakeCrossEncoder()
+    args = (_fake_index(), _fake_mapping(), embed_model, cross_encoder)
+    kwargs: dict[str, Any] = {"faiss_top_k": 4, "rerank_top_k": 2, "rerank_skip_margin": None}
+    batched = search_batch(["q0", "q3"], *args, **kwargs)  # type: ignore[arg-type]
+
+    assert len(embed_model.calls) == 1
+    assert len(cross_encoder.calls) == 1
+    assert len(cross_encoder.calls[0]) == 8
+    assert batched == [
+        search("q0", *args, **kwargs),  # type: ignore[arg-type]
+        search("q3", *args, **kwargs),  # type: ignore[arg-type]
+    ]
+
+
+@pytest.mark.unit
+def test_search_replaces_newlines_in_pairs() -> None:
+    """Cross-encoder pairs carry newline-free verse text."""
+    from rag.retrieve import search
+
+    cross_encoder = FakeCrossEncoder()
+    search(
+        "q1",
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        cross_encoder,  # type: ignore[arg-type]
+        faiss_top_k=2,
+        rerank_skip_margin=None,
+    )
+    assert all("\n" not in text for _, text in cross_encoder.calls[0])
+
+
+@pytest.mark.unit
+def test_search_predict_uses_rerank_batch_size() -> None:
+    """Cross-encoder predict gets the configured batch size and no progress bar."""
+    import config
+    from rag.retrieve import search
+
+    cross_encoder = FakeCrossEncoder()
+    search(
+        "q1",
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        cross_encoder,  # type: ignore[arg-type]
+        rerank_skip_margin=None,
+    )
+    assert cross_encoder.kwargs[0]["batch_size"] == config.RERANK_BATCH_SIZE
+    assert cross_encoder.kwargs[0]["show_progress_bar"] is False
+
+
+@pytest.mark.unit
+def test_predict_length_sorted_restores_input_order() -> None:
+    """Pairs reach predict shortest first and scores come back in input order."""
+    from rag.retrieve import _predict_length_sorted
+
+    class LengthScorer:
+        def __init__(self) -> None:
+            self.seen: list[tuple[str, str]] = []
+
+        def predict(self, pairs: list[tuple[str, str]], **kwargs: object) -> np.ndarray:
+            self.seen = list(pairs)
+            return np.array([float(len(t)) for _, t in pairs], dtype=np.float32)
+
+    pairs = [("q", "long verse text"), ("q", "a"), ("q", "mid text")]
+    scorer = LengthScorer()
+    scores = _predict_length_sorted(scorer, pairs)  # type: ignore[arg-type]
+
+    assert [t for _, t in scorer.seen] == ["a", "mid text", "long verse text"]
+    np.testing.assert_array_equal(scores, [15.0, 1.0, 8.0])
+
+
+@pytest.mark.unit
+def test_search_skips_rerank_when_faiss_is_decisive() -> None:
+    """A wide FAISS margin returns FAISS order with clipped similarity scores."""
+    from rag.retrieve import search
+
+    cross_encoder = FakeCrossEncoder()
+    results = search(
+        "q2",
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        cross_encoder,  # type: ignore[arg-type]
+        faiss_top_k=4,
+        rerank_top_k=2,
+        rerank_skip_margin=0.15,
+    )
+    assert cross_encoder.calls == []
+    assert results[0]["verse"] == "3"
+    assert len(results) == 2
+    assert all(0.0 <= r["score"] <= 1.0 for r in results)
+
+
+@pytest.mark.unit
+def test_search_batch_reranks_only_undecided_queries() -> None:
+    """Only queries under the margin send pairs to the cross-encoder."""
+    from rag.retrieve import search_batch
+
+    cross_encoder = FakeCrossEncoder()
+    results = search_batch(
+        ["q0", "q1"],
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        cross_encoder,  # type: ignore[arg-type]
+        faiss_top_k=4,
+        rerank_top_k=2,
+        rerank_skip_margin=0.15,
+    )
+    assert cross_encoder.calls == []
+    assert [r[0]["verse"] for r in results] == ["1", "2"]
+
+    results = search_batch(
+        ["q0", "q1"],
+        _fake_index(),
+        _fake_mapping(),
+        FakeEmbedModel(),  # type: ignore[arg-type]
+        cross_encoder,  # type: ignore[arg-type]
+        faiss_top_k=4,
+        rerank_top_k=2,
+        rerank_skip_margin=1.0,
+    )
+    assert len(cross_encoder.calls) == 1
+    assert len(cross_encoder.calls[0]) == 8
+
+
+@pytest.mark.unit
+def test_search_batch_reuses_semantic_cache() -> None:
+    """A cached query skips FAISS and the cross-encoder on the next call."""
+    from rag.retrieve import search_batch
+    from rag.semantic_cache import SemanticCache
+
+    cache = SemanticCache(max_size=8, threshold=0.99)
+    cross_encoder = FakeCrossEncoder()
+    kwargs: dict[str, Any] = {
+        "faiss_top_k": 4,
+        "rerank_top_k": 2,
+        "rerank_skip_margin": None,
+        "cache": cache,
+    }
+    args = (_fake_index(), _fake_mapping(), FakeEmbedModel(), cross_encoder)
+
+    first = search_batch(["q1"], *args, **kwargs)  # type: ignore[arg-type]
+    second = search_batch(["q2", "q1"], *args, **kwargs)  # type: ignore[arg-type]
+
+    assert len(cross_encoder.calls) == 2
+    assert [q for q, _ in cross_encoder.calls[1]] == ["q2"] * 4
+    assert second[1] == first[0]
+    assert second[0][0]["verse"] == "3"
+    assert len(cache) == 2
+
+
+@pytest.mark.unit
+def test_faiss_is_decisive_needs_enough_candidates() -> None:
+    """Fewer candidates than rerank_top_k, or no margin, always reranks."""
+    from rag.retrieve import _faiss_is_decisive
+
+    sims = np.array([0.9, 0.5], dtype=np.float32)
+    assert _faiss_is_decisive(sims, 2, 0.15)
+    assert not _faiss_is_decisive(sims, 3, 0.15)
+    assert not _faiss_is_decisive(sims, 2, None)
+    assert not _faiss_is_decisive(sims, 2, 0.5)
+
+
+@pytest.mark.unit
+def test_load_mapping_keeps_query_time_fields(tmp_path: Path) -> None:
+    """Ingest-only columns are dropped when the mapping is loaded."""
+    from rag.retrieve import MAPPING_FIELDS, _load_mapping
+
+    entry = {"rowid": 1, "book": "GEN", "chapter_id": 1, "chapter_title": "Chapitre 1"}
+    entry.update({field: f"v_{field}" for field in MAPPING_FIELDS})
+    path = tmp_path / "mapping.json"
+    path.write_text(json.dumps([entry]), encoding="utf-8")
+
+    assert _load_mapping(path) == [{field: f"v_{field}" for field in MAPPING_FIELDS}]
+
+
+@pytest.mark.unit
+def test_load_mapping_shares_repeated_strings(tmp_path: Path) -> None:
+    """Records of the same book share a single book_title string object."""
+    from rag.retrieve import _load_mapping
+
+    records = [
+        {"book_id": 1, "book_title": "Genèse", "chapter": "1", "verse": str(v), "text": "t"}
+        for v in range(1, 4)
+    ]
+    path = tmp_path / "mapping.json"
+    path.write_text(json.dumps(records), encoding="utf-8")
+
+    loaded = _load_mapping(path)
+    assert loaded == records
+    assert loaded[0]["book_title"] is loaded[2]["book_title"]
+
+
+@pytest.mark.unit
+def test_configure_index_sets_hnsw_ef_search() -> None:
+    """HNSW indexes get the configured efSearch; flat indexes are untouched."""
+    import config
+    from rag.retrieve import _configure_index
+
+    hnsw = faiss.IndexHNSWFlat(DIM, 8, faiss.METRIC_INNER_PRODUCT)
+    _configure_index(hnsw)
+    assert hnsw.hnsw.efSearch == config.FAISS_EF_SEARCH
+
+    flat = _fake_index()
+    _configure_index(flat)
+    assert flat.ntotal == DIM
+
+
+@pytest.mark.unit
+def test_configure_index_sets_ivf_nprobe() -> None:
+    """IVF indexes get the configured nprobe."""
+    import config
+    from rag.retrieve import _configure_index
+
+    ivf = faiss.IndexIVFFlat(faiss.IndexFlatIP(DIM), DIM, 2, faiss.METRIC_INNER_PRODUCT)
+    _configure_index(ivf)
+    assert ivf.nprobe == config.FAISS_NPROBE
+
+
+@pytest.mark.unit
+def test_read_index_maps_vector_storage() -> None:
+    """The index is read with IO_FLAG_MMAP_IFC, which maps non-IVF storage too."""
+    from unittest.mock import patch
+
+    from rag.retrieve import _INDEX_READ_FLAGS, _read_index
+
+    if hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        assert faiss.IO_FLAG_MMAP_IFC == _INDEX_READ_FLAGS
+    else:
+        assert faiss.IO_FLAG_MMAP == _INDEX_READ_FLAGS
+    with patch("faiss.read_index") as read_index:
+        _read_index(Path("index.faiss"))
+    read_index.assert_called_once_with("index.faiss", _INDEX_READ_FLAGS)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "sq8", "ivfpq"])
+def test_read_index_loads_and_searches(tmp_path: Path, index_type: str) -> None:
+    """Every index type ingest can build reloads mapped and stays searchable."""
+    from unittest.mock import patch
+
+    import config
+    from rag.ingest import index_embeddings
+    from rag.retrieve import _read_index
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    with (
+        patch.object(config, "FAISS_IVF_NLIST", 4),
+        patch.object(config, "FAISS_PQ_M", 4),
+    ):
+        built = index_embeddings(vectors, 16, index_type)
+    path = tmp_path / "index.faiss"
+    faiss.write_index(built, str(path))
+
+    loaded = _read_index(path)
+    assert loaded.ntotal == len(vectors)
+    _, expected = built.search(vectors[:5], 3)
+    _, ids = loaded.search(vectors[:5], 3)
+    np.testing.assert_array_equal(ids, expected)
+
+
+@pytest.mark.unit
+def test_maybe_to_gpu_keeps_index_without_gpu() -> None:
+    """Without a visible GPU the loaded index is returned as is."""
+    from unittest.mock import patch
+
+    from rag.retrieve import _maybe_to_gpu
+
+    flat = _fake_index()
+    with patch("faiss.get_num_gpus", return_value=0, create=True):
+        assert _maybe_to_gpu(flat) is flat
+
+
+@pytest.mark.unit
+def test_maybe_to_gpu_skips_hnsw() -> None:
+    """HNSW has no GPU implementation and stays on CPU even with a GPU."""
+    from unittest.mock import patch
+
+    from rag.retrieve import _maybe_to_gpu
+
+    hnsw = faiss.IndexHNSWFlat(DIM, 8, faiss.METRIC_INNER_PRODUCT)
+    with patch("faiss.get_num_gpus", return_value=1, create=True):
+        assert _maybe_to_gpu(hnsw) is hnsw
+
+
 @pytest.mark.integration
-def test_search_returns_correct_count() -> None:
+def test_search_returns_correct_count(pipeline: Pipeline) -> None:
     """Search returns exactly RERANK_TOP_K results."""
-    from rag.retrieve import load_pipeline, search
+    from rag.retrieve import search
 
-    index, mapping, embed_model, cross_encoder = load_pipeline()
+    index, mapping, embed_model, cross_encoder = pipeline
     results = search("création du monde", index, mapping, embed_model, cross_encoder)
     assert len(results) == 5
 
 
 @pytest.mark.integration
-def test_search_results_sorted_by_score() -> None:
+def test_search_results_sorted_by_score(pipeline: Pipeline) -> None:
     """Results are sorted by score in descending order."""
-    from rag.retrieve import load_pipeline, search
+    from rag.retrieve import search
 
-    index, mapping, embed_model, cross_encoder = load_pipeline()
+    index, mapping, embed_model, cross_encoder = pipeline
     results = search("amour de Dieu", index, mapping, embed_model, cross_encoder)
     scores = [r["score"] for r in results]
     assert scores == sorted(scores, reverse=True)
 
 
 @pytest.mark.integration
-def test_search_results_have_required_fields() -> None:
+def test_search_results_have_required_fields(pipeline: Pipeline) -> None:
     """Each result has all required display fields."""
-    from rag.retrieve import load_pipeline, search
+    from rag.retrieve import search
 
-    index, mapping, embed_model, cross_encoder = load_pipeline()
+    index, mapping, embed_model, cross_encoder = pipeline
     results = search("pardon des péchés", index, mapping, embed_model, cross_encoder)
     required_fields = {"book_title", "chapter", "verse", "text", "score"}
     for result in results:
@@ -74,11 +525,11 @@ def test_search_results_have_required_fields() -> None:
 
 
 @pytest.mark.integration
-def test_search_scores_in_range() -> None:
+def test_search_scores_in_range(pipeline: Pipeline) -> None:
     """All scores are between 0.0 and 1.0 after normalization."""
-    from rag.retrieve import load_pipeline, search
+    from rag.retrieve import search
 
-    index, mapping, embed_model, cross_encoder = load_pipeline()
+    index, mapping, embed_model, cross_encoder = pipeline
     results = search("la résurrection", index, mapping, embed_model, cross_encoder)
     for result in results:
         assert 0.0 <= result["score"] <= 1.0
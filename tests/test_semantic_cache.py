@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from rag.semantic_cache import SemanticCache
+
+
+def _unit(*values: float) -> np.ndarray:
+    vec = np.array(values, dtype=np.float32)
+    return vec / np.linalg.norm(vec)
+
+
+@pytest.mark.unit
+def test_empty_cache_misses() -> None:
+    """Lookups on an empty cache return None."""
+    cache = SemanticCache(max_size=4, threshold=0.9)
+    assert cache.get(_unit(1, 0, 0)) is None
+
+
+@pytest.mark.unit
+def test_near_duplicate_embedding_hits() -> None:
+    """An embedding above the threshold returns the cached results."""
+    cache = SemanticCache(max_size=4, threshold=0.97)
+    results = [{"text": "v", "score": 0.9}]
+    cache.put(_unit(1, 0, 0), results)
+
+    assert cache.get(_unit(1, 0.05, 0)) is results
+    assert cache.get(_unit(1, 1, 0)) is None
+
+
+@pytest.mark.unit
+def test_evicts_least_recently_used() -> None:
+    """A full cache drops the entry that was used longest ago."""
+    cache = SemanticCache(max_size=2, threshold=0.99)
+    cache.put(_unit(1, 0, 0), [{"text": "a"}])
+    cache.put(_unit(0, 1, 0), [{"text": "b"}])
+    assert cache.get(_unit(1, 0, 0)) is not None
+
+    cache.put(_unit(0, 0, 1), [{"text": "c"}])
+
+    assert len(cache) == 2
+    assert cache.get(_unit(0, 1, 0)) is None
+    assert cache.get(_unit(1, 0, 0)) == [{"text": "a"}]
+    assert cache.get(_unit(0, 0, 1)) == [{"text": "c"}]
+
+
+@pytest.mark.unit
+def test_zero_size_cache_stores_nothing() -> None:
+    """max_size=0 disables caching."""
+    cache = SemanticCache(max_size=0, threshold=0.9)
+    cache.put(_unit(1, 0, 0), [{"text": "a"}])
+    assert len(cache) == 0
+    assert cache.get(_unit(1, 0, 0)) is None
+
+
+@pytest.mark.unit
+def test_clear_empties_cache() -> None:
+    """clear drops every entry."""
+    cache = SemanticCache(max_size=4, threshold=0.9)
+    cache.put(_unit(1, 0, 0), [{"text": "a"}])
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.get(_unit(1, 0, 0)) is None